@@ -1,8 +1,12 @@
 """
 csv342 is a Python module similar to the the csv module in the standard
-library. Under Python 3, it just calls the standard csv module. Under
-Python 2, it provides a Python 3 like interface to reading and writing CSV
-files, in particular concerning non ASCII characters.
+library. Under Python 2, it provides a Python 3 like interface to reading
+and writing CSV files, in particular concerning non ASCII characters. Under
+Python 3, it uses the standard csv module to parse and format rows. With
+both versions, it adds features like converting columns, reading binary
+streams in any encoding and processing large files, while keyword arguments
+that only have an effect under Python 2 are checked but ignored under
+Python 3.
 
 It is distributed under the BSD license with the source code available from
 https://github.com/roskakori/csv342.
@@ -38,17 +42,640 @@ https://github.com/roskakori/csv342.
 from __future__ import unicode_literals
 
 from csv import *
+import codecs
+import io
+import itertools
+import operator
 import sys
+import time
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
 
 __version__ = '1.0.1'
 
 IS_PYTHON2 = sys.version_info[0] == 2
 
 
+class _LazyModule(object):
+    """
+    Stand-in for the module ``module_name`` that is only imported once one
+    of its attributes is accessed, and then replaces the stand-in as global
+    ``global_name`` in ``namespace``, which defaults to the globals of
+    csv342. This keeps importing csv342 fast for programs that do not need
+    all of its features.
+    """
+
+    def __init__(self, module_name, global_name=None, namespace=None):
+        self._module_name = module_name
+        self._global_name = global_name or module_name
+        self._namespace = namespace if namespace is not None else globals()
+
+    def __getattr__(self, name):
+        __import__(self._module_name)
+        module = sys.modules[self._module_name]
+        self._namespace[self._global_name] = module
+        return getattr(module, name)
+
+
+datetime = _LazyModule('datetime')
+decimal = _LazyModule('decimal')
+numbers = _LazyModule('numbers')
+
+#: Names of the features implemented in `csv342_extras`, which is only
+#: imported once one of them is accessed.
+_EXTRAS_NAMES = (
+    'CHECKPOINT_SUFFIX',
+    'COMPRESSIONS',
+    'Follower',
+    'INDEX_SUFFIX',
+    'IndexedReader',
+    'KEY_INDEX_SUFFIX',
+    'KeyIndex',
+    'MmapDictReader',
+    'MmapReader',
+    'ParallelWriter',
+    'Pipeline',
+    'PrefetchingReader',
+    'WriteBehindWriter',
+    'build_index',
+    'detect',
+    'follow',
+    'iter_column_batches',
+    'mmap_reader',
+    'open',
+    'parallel_reader',
+    'parallel_writer',
+    'pipeline',
+    'read_columns',
+)
+
+
+def __getattr__(name):
+    # Provide the features in `csv342_extras` and ``csv342.aio`` without
+    # importing them unless they are actually used.
+    if name in _EXTRAS_NAMES:
+        import csv342_extras
+        result = getattr(csv342_extras, name)
+        globals()[name] = result
+        return result
+    if name == 'aio' and not IS_PYTHON2:
+        import csv342_aio
+        return csv342_aio
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def _is_binary_stream(stream):
+    """
+    True if ``stream`` is a binary stream, for example a file opened with
+    ``io.open(path, 'rb')``.
+    """
+    result = isinstance(stream, (io.BufferedIOBase, io.RawIOBase))
+    if not result and IS_PYTHON2:
+        result = isinstance(stream, file) and 'b' in getattr(stream, 'mode', '')
+    return result
+
+
+#: Byte order marks and the encoding to decode a stream starting with them,
+#: where the UTF-32 marks come first because they start with the UTF-16 marks.
+_BOM_ENCODINGS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+
+def _peeked_bytes(binary_stream, size):
+    """
+    Up to ``size`` bytes at the current position of ``binary_stream``
+    without consuming them, or ``b''`` if the stream can neither peek nor
+    seek.
+    """
+    if hasattr(binary_stream, 'peek'):
+        return binary_stream.peek(size)[:size]
+    try:
+        if hasattr(binary_stream, 'seekable') and not binary_stream.seekable():
+            return b''
+        position = binary_stream.tell()
+    except (IOError, OSError):
+        # For example a Python 2 file for a pipe.
+        return b''
+    result = binary_stream.read(size)
+    binary_stream.seek(position)
+    return result
+
+
+def _binary_stream_encoding(binary_stream, encoding):
+    """
+    The encoding to decode ``binary_stream`` with, which is ``encoding``
+    unless it is ``None``. In that case, it is the encoding indicated by a
+    byte order mark at the start of the stream, or UTF-8 without one. The
+    resulting encoding skips the byte order mark while decoding.
+    """
+    if encoding is not None:
+        return encoding
+    start = _peeked_bytes(binary_stream, len(codecs.BOM_UTF32))
+    for bom, bom_encoding in _BOM_ENCODINGS:
+        if start.startswith(bom):
+            return bom_encoding
+    return 'utf-8-sig'
+
+
+def _is_utf8(encoding):
+    return codecs.lookup(encoding).name == 'utf-8'
+
+
+def _ascii_compatible_encoding(encoding):
+    """
+    The encoding to decode lines with for data in ``encoding``, which is
+    UTF-8 for ``utf-8-sig`` because a byte order mark at the start of the
+    data is skipped anyway, see `_utf8_bom_size()`.
+
+    Raise `ValueError` unless ``encoding`` represents line breaks and other
+    CSV syntax the same way as ASCII, which is necessary to split the encoded
+    data into lines without decoding it first.
+    """
+    if codecs.lookup(encoding).name == 'utf-8-sig':
+        return 'utf-8'
+    csv_syntax = '\r\n"\',;\t '
+    if csv_syntax.encode(encoding) != csv_syntax.encode('ascii'):
+        raise ValueError('encoding must be ASCII compatible but is: %s' % encoding)
+    return encoding
+
+
+def _utf8_bom_size(data, encoding):
+    """
+    Number of bytes of a UTF-8 byte order mark at the start of ``data`` if
+    ``encoding`` is UTF-8, otherwise 0.
+    """
+    if _is_utf8(encoding) and data.startswith(codecs.BOM_UTF8):
+        return len(codecs.BOM_UTF8)
+    return 0
+
+
+#: Names of the formatting parameters a dialect consists of.
+_DIALECT_ATTRIBUTE_NAMES = (
+    'delimiter', 'doublequote', 'escapechar', 'lineterminator', 'quotechar', 'quoting', 'skipinitialspace', 'strict')
+
+
+def _dialect_keywords(dialect, keywords):
+    """
+    Formatting parameters of ``dialect`` (a name or dialect) updated with
+    ``keywords`` in a dictionary that can be passed to other processes, for
+    example to ``reader(..., **result)``.
+    """
+    if not hasattr(dialect, 'delimiter'):
+        dialect = get_dialect(dialect)
+    result = dict(
+        (name, getattr(dialect, name)) for name in _DIALECT_ATTRIBUTE_NAMES if hasattr(dialect, name))
+    result.update(keywords)
+    return result
+
+
+def _record_quotechar(dialect_keywords):
+    """
+    The quote character to count in order to find out whether a line break
+    ends a record or is part of a quoted field, or ``None`` if all line
+    breaks end a record. Because escaped quote characters cannot be told
+    apart without parsing, dialects with an ``escapechar`` are rejected.
+    """
+    if dialect_keywords.get('escapechar') is not None:
+        raise ValueError('records cannot be split without parsing when using an escapechar')
+    if dialect_keywords.get('quoting') == QUOTE_NONE:
+        return None
+    return dialect_keywords.get('quotechar')
+
+
+def _checked_column_indexes(column_indexes):
+    """
+    ``column_indexes`` as tuple after checking that it contains at least one
+    index and only indexes that are integer numbers of at least 0.
+    """
+    result = tuple(column_indexes)
+    if not result:
+        raise ValueError('usecols must contain at least one column')
+    for column_index in result:
+        if not isinstance(column_index, numbers.Integral) or column_index < 0:
+            raise ValueError('column index is %r but must be an integer number of at least 0' % (column_index,))
+    return result
+
+
+def _column_selector(column_indexes, missing_value):
+    """
+    Function that returns a list with the items of a row at
+    ``column_indexes``, using ``missing_value`` for columns the row is too
+    short for. Empty rows remain empty.
+    """
+    get_columns = operator.itemgetter(*column_indexes)
+    max_column_index = max(column_indexes)
+    has_single_column = len(column_indexes) == 1
+
+    def select_columns(row):
+        row_length = len(row)
+        if row_length > max_column_index:
+            if has_single_column:
+                return [get_columns(row)]
+            return list(get_columns(row))
+        if row_length == 0:
+            return []
+        return [row[column_index] if column_index < row_length else missing_value
+                for column_index in column_indexes]
+
+    return select_columns
+
+
+def _parsed_bool(text):
+    lower_text = text.lower()
+    if lower_text in ('true', 'yes', '1'):
+        return True
+    if lower_text in ('false', 'no', '0'):
+        return False
+    raise ValueError('boolean value must be one of true, false, yes, no, 1 or 0 but is: %r' % text)
+
+
+def _parsed_date(text):
+    return datetime.datetime.strptime(text, '%Y-%m-%d').date()
+
+
+def _parsed_datetime(text):
+    # Accept both ISO 8601 and the format of ``str(datetime)``.
+    text = text.replace(' ', 'T', 1)
+    datetime_format = '%Y-%m-%dT%H:%M:%S.%f' if '.' in text else '%Y-%m-%dT%H:%M:%S'
+    return datetime.datetime.strptime(text, datetime_format)
+
+
+def _parsed_decimal(text):
+    return decimal.Decimal(text)
+
+
+def _none_if_empty(convert):
+    def convert_unless_empty(text):
+        return convert(text) if text else None
+
+    return convert_unless_empty
+
+
+#: Functions to convert text to the type for each possible ``dtype``; empty
+#: texts are converted to ``None``.
+_DTYPE_TO_CONVERTER = {
+    'bool': _none_if_empty(_parsed_bool),
+    'date': _none_if_empty(_parsed_date),
+    'datetime': _none_if_empty(_parsed_datetime),
+    'decimal': _none_if_empty(_parsed_decimal),
+    'float': _none_if_empty(float),
+    'int': _none_if_empty(int),
+    'str': None,
+}
+
+#: Functions to convert values of each possible ``dtype`` to text that can be
+#: read using the same ``dtype``, or ``None`` to use the default conversion.
+_DTYPE_TO_FORMATTER = {
+    'bool': lambda value: 'true' if value else 'false',
+    'date': lambda value: value.isoformat(),
+    'datetime': lambda value: value.isoformat(),
+    'decimal': None,
+    'float': lambda value: repr(float(value)),
+    'int': None,
+    'str': None,
+}
+
+
+def _compiled_converters(converters, dtypes, dtype_to_converter, column_position):
+    """
+    Pairs of ``(position, converter)`` sorted by position, where the
+    position is the result of ``column_position(column)`` for each column
+    in ``converters`` and ``dtypes``. Converters take precedence over dtypes.
+    """
+    position_to_converter = {}
+    for column, dtype in (dtypes or {}).items():
+        try:
+            converter = dtype_to_converter[dtype]
+        except KeyError:
+            raise ValueError('dtype for column %r is %r but must be one of: %s' % (
+                column, dtype, ', '.join(sorted(dtype_to_converter))))
+        if converter is not None:
+            position_to_converter[column_position(column)] = converter
+    for column, converter in (converters or {}).items():
+        position_to_converter[column_position(column)] = converter
+    return sorted(position_to_converter.items())
+
+
+def _row_converter(positions_and_converters):
+    """
+    Function that replaces the items of a row at the positions of
+    ``positions_and_converters`` by the result of the respective converter.
+    Missing and ``None`` items remain unchanged.
+    """
+    positions_and_converters = tuple(positions_and_converters)
+
+    def convert_row(row):
+        row_length = len(row)
+        for position, converter in positions_and_converters:
+            if position < row_length:
+                item = row[position]
+                if item is not None:
+                    try:
+                        row[position] = converter(item)
+                    except (TypeError, ValueError, decimal.InvalidOperation) as error:
+                        raise ValueError('cannot convert item %d: %r: %s' % (position + 1, item, error))
+        return row
+
+    return convert_row
+
+
+def _index_position_function(usecols):
+    """
+    Function that returns the position of a column index in rows limited
+    to ``usecols``.
+    """
+    def column_position(column_index):
+        if not isinstance(column_index, numbers.Integral) or column_index < 0:
+            raise ValueError('column index is %r but must be an integer number of at least 0' % (column_index,))
+        if usecols is None:
+            return column_index
+        try:
+            return list(usecols).index(column_index)
+        except ValueError:
+            raise ValueError('column index %d must be one of usecols: %s' % (column_index, list(usecols)))
+
+    return column_position
+
+
+def _with_converters(csv_reader, usecols, converters, dtypes):
+    """
+    ``csv_reader`` with the columns in ``converters`` and ``dtypes``
+    converted.
+    """
+    if converters or dtypes:
+        positions_and_converters = _compiled_converters(
+            converters, dtypes, _DTYPE_TO_CONVERTER, _index_position_function(usecols))
+        if positions_and_converters:
+            csv_reader = _TransformingReader(csv_reader, _row_converter(positions_and_converters))
+    return csv_reader
+
+
+#: Default number of recently used values `intern_columns` remembers for
+#: each column.
+_DEFAULT_INTERN_LIMIT = 1024
+
+
+class _InternCache(object):
+    """
+    Cache that returns the same object for equal values as long as they
+    have been used recently. To avoid the cost of exact LRU bookkeeping for
+    each value, it keeps two generations of up to ``limit`` values each:
+    once the current generation is full, it replaces the previous one, and
+    values used from the previous generation move to the current one.
+    """
+
+    def __init__(self, limit):
+        if limit < 1:
+            raise ValueError('intern_limit is %d but must be at least 1' % limit)
+        self._limit = limit
+        self._current = {}
+        self._previous = {}
+
+    def intern(self, value):
+        result = self._current.get(value)
+        if result is None:
+            result = self._previous.get(value, value)
+            if len(self._current) >= self._limit:
+                self._previous = self._current
+                self._current = {}
+            self._current[result] = result
+        return result
+
+
+def _row_interner(positions, limit):
+    """
+    Function that replaces the items at ``positions`` of a row by equal
+    items of earlier rows.
+    """
+    positions_and_interns = [(position, _InternCache(limit).intern) for position in sorted(set(positions))]
+
+    def intern_row(row):
+        row_length = len(row)
+        for position, intern in positions_and_interns:
+            if position < row_length:
+                row[position] = intern(row[position])
+        return row
+
+    return intern_row
+
+
+def _with_interning(csv_reader, usecols, intern_columns, intern_limit):
+    """
+    ``csv_reader`` where the items of equal values in ``intern_columns``
+    are the same object.
+    """
+    if not intern_columns:
+        if intern_limit < 1:
+            raise ValueError('intern_limit is %d but must be at least 1' % intern_limit)
+        return csv_reader
+    column_position = _index_position_function(usecols)
+    return _TransformingReader(
+        csv_reader, _row_interner([column_position(column) for column in intern_columns], intern_limit))
+
+
+
+#: Default maximum number of rows processed as one batch, for example by
+#: `iter_batches()` or by ``writerows()`` under Python 2.
+_DEFAULT_BATCH_ROW_COUNT = 1000
+
+try:
+    _timer = time.perf_counter
+except AttributeError:  # Python 2
+    _timer = time.time
+
+
+class Statistics(object):
+    """
+    Counters a reader or writer updates when passed as ``statistics``:
+
+    * ``rows``: number of rows read respectively written, including headers.
+    * ``fields``: number of items in these rows.
+    * ``data_size``: size of the CSV data read respectively written, in
+      characters under Python 3 and in UTF-8 bytes under Python 2.
+    * ``parse_seconds``: time spent parsing respectively formatting rows,
+      including conversions.
+    * ``transcode_seconds``: time spent reading lines and reencoding them
+      to UTF-8 and decoding the items respectively encoding the items and
+      decoding the result. Under Python 3, this is only the time spent
+      reading lines because the `csv` module parses and formats text.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.fields = 0
+        self.data_size = 0
+        self.parse_seconds = 0.0
+        self.transcode_seconds = 0.0
+
+    def __repr__(self):
+        return '%s(rows=%d, fields=%d, data_size=%d, parse_seconds=%f, transcode_seconds=%f)' % (
+            self.__class__.__name__, self.rows, self.fields, self.data_size, self.parse_seconds,
+            self.transcode_seconds)
+
+
+def _measured_lines(lines, statistics):
+    """
+    The items of ``lines`` while adding their size and the time needed to
+    obtain them to ``statistics``.
+    """
+    lines = iter(lines)
+    while True:
+        start_time = _timer()
+        try:
+            line = next(lines)
+        except StopIteration:
+            statistics.transcode_seconds += _timer() - start_time
+            return
+        statistics.transcode_seconds += _timer() - start_time
+        statistics.data_size += len(line)
+        yield line
+
+
+class _MeasuringStream(object):
+    """
+    Wrapper for a writable ``stream`` that adds the size of the data
+    written and the time needed to write it to ``statistics``.
+    """
+
+    def __init__(self, stream, statistics):
+        self._stream = stream
+        self._statistics = statistics
+
+    def write(self, data):
+        start_time = _timer()
+        try:
+            return self._stream.write(data)
+        finally:
+            self._statistics.transcode_seconds += _timer() - start_time
+            self._statistics.data_size += len(data)
+
+
+class _Measuring(object):
+    """
+    Base for readers and writers that update ``statistics`` and call
+    ``progress(statistics)`` every ``progress_every`` rows.
+    """
+
+    def __init__(self, statistics, progress, progress_every):
+        self.statistics = statistics
+        self._progress = progress
+        self._progress_every = progress_every
+
+    def _measure(self, function, *arguments):
+        """
+        Result of ``function(*arguments)`` where the time spent is added to
+        ``statistics`` unless the reader or writer wrapped already added it
+        for parts of it. The remaining time counts as parsing, except for
+        writers under Python 2, where the wrapped writer measures the
+        formatting.
+        """
+        statistics = self.statistics
+        parse_seconds = statistics.parse_seconds
+        transcode_seconds = statistics.transcode_seconds
+        start_time = _timer()
+        try:
+            return function(*arguments)
+        finally:
+            remaining_seconds = (_timer() - start_time) - (statistics.parse_seconds - parse_seconds) - (
+                statistics.transcode_seconds - transcode_seconds)
+            if IS_PYTHON2 and statistics.parse_seconds != parse_seconds:
+                statistics.transcode_seconds += remaining_seconds
+            else:
+                statistics.parse_seconds += remaining_seconds
+
+    def _count(self, row):
+        statistics = self.statistics
+        statistics.rows += 1
+        if hasattr(row, '__len__'):
+            statistics.fields += len(row)
+        if self._progress is not None and statistics.rows % self._progress_every == 0:
+            self._progress(statistics)
+
+
+class _MeasuringReader(_Measuring):
+    """
+    A reader that reads rows from ``csv_reader`` while updating
+    ``statistics``, see `_Measuring`.
+    """
+
+    def __init__(self, csv_reader, statistics, progress, progress_every):
+        super(_MeasuringReader, self).__init__(statistics, progress, progress_every)
+        self._csv_reader = csv_reader
+        if hasattr(csv_reader, '_select_columns'):
+            self._select_columns = csv_reader._select_columns
+
+    @property
+    def dialect(self):
+        return self._csv_reader.dialect
+
+    @property
+    def line_num(self):
+        return self._csv_reader.line_num
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        result = self._measure(next, self._csv_reader)
+        self._count(result)
+        return result
+
+    def next(self):
+        return self.__next__()
+
+
+class _MeasuringWriter(_Measuring):
+    """
+    A writer that writes rows to ``csv_writer`` while updating
+    ``statistics``, see `_Measuring`.
+    """
+
+    def __init__(self, csv_writer, statistics, progress, progress_every):
+        super(_MeasuringWriter, self).__init__(statistics, progress, progress_every)
+        self._csv_writer = csv_writer
+
+    @property
+    def dialect(self):
+        return self._csv_writer.dialect
+
+    def writerow(self, row):
+        result = self._measure(self._csv_writer.writerow, row)
+        self._count(row)
+        return result
+
+    def _counted_rows(self, rows):
+        for row in rows:
+            yield row
+            self._count(row)
+
+    def writerows(self, rows):
+        # Pass all rows at once so writers that batch rows still can.
+        return self._measure(self._csv_writer.writerows, self._counted_rows(rows))
+
+
+def _with_statistics(csv_reader_or_writer, measuring_class, statistics, progress, progress_every):
+    """
+    ``csv_reader_or_writer`` wrapped in ``measuring_class`` unless neither
+    ``statistics`` nor ``progress`` are specified.
+    """
+    if progress_every < 1:
+        raise ValueError('progress_every is %d but must be at least 1' % progress_every)
+    if statistics is None and progress is None:
+        return csv_reader_or_writer
+    return measuring_class(csv_reader_or_writer, statistics or Statistics(), progress, progress_every)
+
+
 if IS_PYTHON2:
     import csv
     import cStringIO
-    import io
     import StringIO
 
     _binary_type = str
@@ -56,6 +683,10 @@ if IS_PYTHON2:
     _type_of_StringI = type(cStringIO.StringIO(''))
     _type_of_StringO = type(cStringIO.StringIO())
 
+    #: Default maximum number of bytes `_UnicodeCsvWriter.writerows` collects
+    #: before writing them to the target stream.
+    _DEFAULT_BATCH_SIZE = 1024 * 1024
+
     def _key_to_str_value_map(key_to_value_map):
         """
         Similar to ``key_to_value_map`` but with values of type `unicode`
@@ -85,17 +716,24 @@ if IS_PYTHON2:
         target to accept unicode strings.
         """
 
-        def __init__(self, target_stream, dialect=csv.excel, **keywords):
+        def __init__(self, target_stream, dialect=csv.excel, batch_row_count=_DEFAULT_BATCH_ROW_COUNT,
+                     batch_size=_DEFAULT_BATCH_SIZE, **keywords):
             if isinstance(target_stream, (_type_of_StringO, StringIO.StringIO)):
                 raise Error(
                     'use io.StringIO instead of %r for target_stream' %
                     type(target_stream))
+            if batch_row_count < 1:
+                raise ValueError('batch_row_count is %d but must be at least 1' % batch_row_count)
+            if batch_size < 1:
+                raise ValueError('batch_size is %d but must be at least 1' % batch_size)
             self._target_stream = target_stream
             self._queue = io.BytesIO()
             str_keywords = _key_to_str_value_map(keywords)
             self._csv_writer = csv.writer(self._queue, dialect=dialect, **str_keywords)
+            self.batch_row_count = batch_row_count
+            self.batch_size = batch_size
 
-        def writerow(self, row):
+        def _write_to_queue(self, row):
             assert row is not None
 
             row_as_list = list(row)
@@ -111,52 +749,202 @@ if IS_PYTHON2:
                 self._csv_writer.writerow(row_to_write)
             except TypeError as error:
                 raise TypeError('%s: %s' % (error, row_as_list))
+
+        def _measure_formatting(self, statistics):
+            """
+            Add the time spent formatting rows and the size of the result to
+            ``statistics`` from now on.
+            """
+            self._csv_writer = _MeasuringPython2CsvWriter(self._csv_writer, statistics)
+
+        def _flush_queue(self):
             data = self._queue.getvalue()
-            data = data.decode('utf-8')
-            self._target_stream.write(data)
-            # Clear the BytesIO before writing the next row.
-            self._queue.seek(0)
-            self._queue.truncate(0)
+            if data:
+                # Clear the BytesIO before writing so a failing target stream
+                # does not cause the same data to be written again.
+                self._queue.seek(0)
+                self._queue.truncate(0)
+                self._target_stream.write(data.decode('utf-8'))
+
+        def writerow(self, row):
+            self._write_to_queue(row)
+            self._flush_queue()
 
         def writerows(self, rows):
-            for row in rows:
-                self.writerow(row)
+            """
+            Write all ``rows``, collecting up to `batch_row_count` rows
+            respectively `batch_size` bytes of CSV data before decoding them
+            and passing them to the target stream in a single write.
+            """
+            row_count_in_batch = 0
+            try:
+                for row in rows:
+                    self._write_to_queue(row)
+                    row_count_in_batch += 1
+                    if row_count_in_batch >= self.batch_row_count or self._queue.tell() >= self.batch_size:
+                        self._flush_queue()
+                        row_count_in_batch = 0
+            finally:
+                self._flush_queue()
+
+    class _MeasuringPython2CsvWriter(object):
+        """
+        Wrapper for a `csv.writer` that adds the time spent in
+        ``writerow()`` and the number of bytes written to ``statistics``.
+        """
+
+        def __init__(self, csv_writer, statistics):
+            self._csv_writer = csv_writer
+            self._statistics = statistics
+
+        def writerow(self, row):
+            start_time = _timer()
+            try:
+                data_size = self._csv_writer.writerow(row)
+            finally:
+                self._statistics.parse_seconds += _timer() - start_time
+            self._statistics.data_size += data_size
+
+    _encode_utf8 = operator.methodcaller('encode', 'utf-8')
+
+    def _decoded_row(row):
+        """
+        ``row`` with all UTF-8 encoded items decoded to unicode. Because
+        `csv.reader` rejects NUL characters, the items can be joined using NUL
+        and decoded all at once, which is a lot faster than decoding them one
+        by one.
+        """
+        if row:
+            return b'\0'.join(row).decode('utf-8').split('\0')
+        return []
+
+    def _decoding_column_selector(column_indexes, missing_value):
+        """
+        Same as `_column_selector()` but the selected UTF-8 encoded items are
+        decoded while all other items remain untouched.
+        """
+        get_columns = operator.itemgetter(*column_indexes)
+        max_column_index = max(column_indexes)
+        has_single_column = len(column_indexes) == 1
+
+        def select_and_decode_columns(row):
+            row_length = len(row)
+            if row_length > max_column_index:
+                if has_single_column:
+                    return [get_columns(row).decode('utf-8')]
+                return _decoded_row(get_columns(row))
+            if row_length == 0:
+                return []
+            return [row[column_index].decode('utf-8') if column_index < row_length else missing_value
+                    for column_index in column_indexes]
+
+        return select_and_decode_columns
 
     class _Utf8Recoder(object):
         """
         Iterator that reads a text stream and reencodes the input to UTF-8.
+
+        If ``chunk_size`` is specified and the text stream has a ``read()``
+        method, it is read and reencoded in chunks of about ``chunk_size``
+        characters instead of line by line. Because ``read()`` waits until
+        the chunk is complete, this should not be used with interactive
+        streams.
         """
-        def __init__(self, text_stream):
+        def __init__(self, text_stream, chunk_size=None):
             if isinstance(text_stream, StringIO.StringIO):
                 raise Error('StringIO.StringIO for CSV must be changed to io.StringIO')
-            self._text_stream = iter(text_stream)
+            if chunk_size is not None and chunk_size < 1:
+                raise ValueError('chunk_size is %d but must be at least 1' % chunk_size)
+            if chunk_size is not None and hasattr(text_stream, 'read'):
+                self._lines = itertools.chain.from_iterable(
+                    _Utf8Recoder._chunked_lines(text_stream, chunk_size))
+            else:
+                self._lines = itertools.imap(_encode_utf8, text_stream)
+
+        @staticmethod
+        def _chunked_lines(text_stream, chunk_size):
+            """
+            Lists of UTF-8 encoded lines from ``text_stream`` read in chunks
+            of ``chunk_size`` characters.
+            """
+            pending_line = b''
+            chunk = text_stream.read(chunk_size)
+            while chunk:
+                lines = (pending_line + chunk.encode('utf-8')).splitlines(True)
+                # Keep the last line because it might be incomplete or end
+                # with a '\r' that is followed by a '\n' in the next chunk.
+                pending_line = lines.pop()
+                yield lines
+                chunk = text_stream.read(chunk_size)
+            if pending_line:
+                yield [pending_line]
 
         def __iter__(self):
-            return self
+            # Return the underlying iterator so that `csv.reader` can iterate
+            # it without calling any Python code for each line.
+            return self._lines
 
         def __next__(self):
-            return self._text_stream.next().encode('utf-8')
+            return next(self._lines)
 
         def next(self):
             return self.__next__()
 
+    #: Default number of characters `reader()` reencodes at once for binary
+    #: streams that are not UTF-8 encoded.
+    _DEFAULT_DECODE_CHUNK_SIZE = 64 * 1024
+
     class _UnicodeCsvReader(object):
         """
-        A CSV reader which will iterate over lines in the CSV file 'csv_file',
-        which is encoded in the given encoding.
+        A CSV reader which will iterate over the UTF-8 encoded lines in
+        ``utf8_lines``.
         """
 
-        def __init__(self, csv_file, dialect=csv.excel, **keywords):
-            csv_file = _Utf8Recoder(csv_file)
+        def __init__(self, utf8_lines, dialect=csv.excel, usecols=None, **keywords):
             str_keywords = _key_to_str_value_map(keywords)
-            self.reader = csv.reader(csv_file, dialect=dialect, **str_keywords)
+            self.reader = csv.reader(utf8_lines, dialect=dialect, **str_keywords)
             self.line_num = -1
+            self._decoded_row = _decoded_row
+            self._statistics = None
+            if usecols is not None:
+                self._select_columns(_checked_column_indexes(usecols), '')
+
+        def _select_columns(self, column_indexes, missing_value):
+            """
+            Only decode and return the items at ``column_indexes`` from now
+            on, using ``missing_value`` for columns a row is too short for.
+            """
+            self._decoded_row = _decoding_column_selector(column_indexes, missing_value)
+            if self._statistics is not None:
+                self._measure_decoding(self._statistics)
+
+        def _filter_raw_rows(self, accepts_raw_row):
+            """
+            Skip rows for which ``accepts_raw_row(row)`` is false from now on,
+            where ``row`` contains the UTF-8 encoded items before decoding.
+            """
+            self.reader = itertools.ifilter(accepts_raw_row, self.reader)
+
+        def _measure_decoding(self, statistics):
+            """
+            Add the time spent decoding rows to ``statistics`` from now on.
+            """
+            decoded_row = self._decoded_row
+
+            def measured_decoded_row(row):
+                start_time = _timer()
+                try:
+                    return decoded_row(row)
+                finally:
+                    statistics.transcode_seconds += _timer() - start_time
+
+            self._statistics = statistics
+            self._decoded_row = measured_decoded_row
 
         def __next__(self):
             self.line_num += 1
             row = self.reader.next()
-            result = [item.decode('utf-8') for item in row]
-            return result
+            return self._decoded_row(row)
 
         def next(self):
             return self.__next__()
@@ -164,117 +952,676 @@ if IS_PYTHON2:
         def __iter__(self):
             return self
 
+        def read_rows(self, row_count):
+            """
+            List of at most ``row_count`` rows; an empty list means that all
+            rows have been read.
+            """
+            decoded_row = self._decoded_row
+            result = [decoded_row(row) for row in itertools.islice(self.reader, row_count)]
+            self.line_num += len(result)
+            return result
+
+        def iter_batches(self, batch_row_count=_DEFAULT_BATCH_ROW_COUNT):
+            """
+            Lists of at most ``batch_row_count`` rows until all rows have been
+            read.
+            """
+            rows = self.read_rows(batch_row_count)
+            while rows:
+                yield rows
+                rows = self.read_rows(batch_row_count)
+
+    def _utf8_lines_reader(utf8_lines, dialect, usecols, converters, dtypes, intern_columns, intern_limit, statistics,
+                           progress, progress_every, keywords):
+        if statistics is None and progress is not None:
+            statistics = Statistics()
+        if statistics is not None:
+            utf8_lines = _measured_lines(utf8_lines, statistics)
+        result = _UnicodeCsvReader(utf8_lines, dialect=dialect, usecols=usecols, **keywords)
+        if statistics is not None:
+            result._measure_decoding(statistics)
+        result = _with_interning(result, usecols, intern_columns, intern_limit)
+        result = _with_converters(result, usecols, converters, dtypes)
+        return _with_statistics(result, _MeasuringReader, statistics, progress, progress_every)
+
+    def _without_utf8_bom(utf8_lines):
+        """
+        ``utf8_lines`` without a UTF-8 byte order mark at the start of the
+        first line.
+        """
+        def first_line_without_bom():
+            for first_line in utf8_lines:
+                if first_line.startswith(codecs.BOM_UTF8):
+                    first_line = first_line[len(codecs.BOM_UTF8):]
+                yield first_line
+                break
+
+        utf8_lines = iter(utf8_lines)
+        # Chain the remaining lines so that they are read without calling any
+        # Python code for each line.
+        return itertools.chain.from_iterable((first_line_without_bom(), utf8_lines))
+
+    def _binary_stream_utf8_lines(binary_stream, encoding, errors, chunk_size):
+        """
+        UTF-8 encoded lines from ``binary_stream``, see `reader()`.
+        """
+        encoding = _binary_stream_encoding(binary_stream, encoding)
+        encoding_name = codecs.lookup(encoding).name
+        if errors == 'strict' and encoding_name in ('utf-8', 'utf-8-sig'):
+            # Pass the lines to the parser as they are and only decode the
+            # items of rows, which also reports malformed UTF-8.
+            return _without_utf8_bom(binary_stream) if encoding_name == 'utf-8-sig' else binary_stream
+        text_stream = codecs.getreader(encoding)(binary_stream, errors)
+        return _Utf8Recoder(text_stream, chunk_size if chunk_size is not None else _DEFAULT_DECODE_CHUNK_SIZE)
 
-    def reader(source_text_stream, dialect=csv.excel, **keywords):
+    def reader(source_stream, dialect=csv.excel, chunk_size=None, usecols=None, converters=None, dtypes=None,
+               intern_columns=None, intern_limit=_DEFAULT_INTERN_LIMIT, statistics=None, progress=None,
+               progress_every=_DEFAULT_BATCH_ROW_COUNT, encoding=None, errors='strict', **keywords):
         """
         Same as Python 3's `csv.reader` but works with Python 2.
+
+        If ``source_stream`` is a binary stream, it is decoded using
+        ``encoding`` and ``errors`` (see `codecs`) while parsing. Without an
+        ``encoding``, a byte order mark at the start of the stream tells the
+        encoding, otherwise it is UTF-8. UTF-8 is passed to the parser
+        without reencoding it first, other encodings are reencoded in chunks
+        of ``chunk_size`` characters.
         """
-        assert source_text_stream is not None
+        assert source_stream is not None
+
+        if _is_binary_stream(source_stream):
+            utf8_lines = _binary_stream_utf8_lines(source_stream, encoding, errors, chunk_size)
+        else:
+            utf8_lines = _Utf8Recoder(source_stream, chunk_size)
+        return _utf8_lines_reader(
+            utf8_lines, dialect, usecols, converters, dtypes, intern_columns, intern_limit, statistics, progress,
+            progress_every, keywords)
 
-        return _UnicodeCsvReader(source_text_stream, dialect=dialect, **keywords)
+    def _binary_lines_reader(binary_lines, encoding, dialect=csv.excel, chunk_size=None, usecols=None,
+                             converters=None, dtypes=None, intern_columns=None, intern_limit=_DEFAULT_INTERN_LIMIT,
+                             statistics=None, progress=None, progress_every=_DEFAULT_BATCH_ROW_COUNT, **keywords):
+        """
+        Same as `reader()` but for an iterable of lines of bytes in the ASCII
+        compatible ``encoding``.
+        """
+        if not _is_utf8(encoding):
+            binary_lines = itertools.imap(
+                lambda line: line.decode(encoding).encode('utf-8'), binary_lines)
+        return _utf8_lines_reader(
+            binary_lines, dialect, usecols, converters, dtypes, intern_columns, intern_limit, statistics, progress,
+            progress_every, keywords)
 
 
-    def writer(target_text_stream, dialect=csv.excel, **keywords):
+    def writer(target_text_stream, dialect=csv.excel, converters=None, dtypes=None, statistics=None, progress=None,
+               progress_every=_DEFAULT_BATCH_ROW_COUNT, **keywords):
         """
         Same as Python 3's `csv.writer` but works with Python 2.
         """
         assert target_text_stream is not None
 
-        return _UnicodeCsvWriter(target_text_stream, dialect=dialect, **keywords)
+        result = _UnicodeCsvWriter(target_text_stream, dialect=dialect, **keywords)
+        if statistics is None and progress is not None:
+            statistics = Statistics()
+        if statistics is not None:
+            result._measure_formatting(statistics)
+        result = _with_formatters(result, converters, dtypes)
+        return _with_statistics(result, _MeasuringWriter, statistics, progress, progress_every)
 
+else:
+    import csv
 
-    class DictReader:
-        def __init__(self, input_stream, fieldnames=None, restkey=None, restval=None,
-                     dialect="excel", *args, **kwds):
-            self._fieldnames = fieldnames
-            self.restkey = restkey
-            self.restval = restval
-            self.reader = reader(input_stream, dialect, *args, **kwds)
-            self.dialect = dialect
+    #: Keyword arguments for `reader()` that only have an effect under Python 2.
+    _PYTHON2_READER_KEYWORDS = ('chunk_size',)
+    #: Keyword arguments for `writer()` that only have an effect under Python 2.
+    _PYTHON2_WRITER_KEYWORDS = ('batch_row_count', 'batch_size')
 
-        def __iter__(self):
-            return self
+    class _BorrowedTextIOWrapper(io.TextIOWrapper):
+        """
+        A `io.TextIOWrapper` that leaves the wrapped binary stream open once
+        it gets garbage collected because the binary stream is owned by the
+        caller.
+        """
+        def __del__(self):
+            try:
+                self.detach()
+            except ValueError:
+                # Already detached or closed.
+                pass
+
+    def _without_python2_keywords(keywords, python2_keywords):
+        """
+        ``keywords`` without ``python2_keywords``, which have no effect under
+        Python 3 but are checked the same way as under Python 2 so that code
+        that works under one version also works under the other.
+        """
+        result = dict(keywords)
+        for name in python2_keywords:
+            value = result.pop(name, None)
+            if value is not None and value < 1:
+                raise ValueError('%s is %d but must be at least 1' % (name, value))
+        return result
 
-        def _set_fieldnames_from_first_row(self):
-            assert self._fieldnames is None
-            self._fieldnames = next(self.reader)
+    def reader(source_stream, dialect='excel', usecols=None, converters=None, dtypes=None, intern_columns=None,
+               intern_limit=_DEFAULT_INTERN_LIMIT, statistics=None, progress=None,
+               progress_every=_DEFAULT_BATCH_ROW_COUNT, encoding=None, errors='strict', **keywords):
+        """
+        Same as `csv.reader` but also accepts a binary stream, which is
+        decoded using ``encoding`` and ``errors`` while parsing. Without an
+        ``encoding``, a byte order mark at the start of the stream tells the
+        encoding, otherwise it is UTF-8.
+        """
+        assert source_stream is not None
 
-        @property
-        def fieldnames(self):
-            if self._fieldnames is None:
-                try:
-                    self._set_fieldnames_from_first_row()
-                except StopIteration:
-                    pass
-            return self._fieldnames
+        if _is_binary_stream(source_stream):
+            source_stream = _BorrowedTextIOWrapper(
+                source_stream, encoding=_binary_stream_encoding(source_stream, encoding), errors=errors, newline='')
+        if statistics is None and progress is not None:
+            statistics = Statistics()
+        if statistics is not None:
+            source_stream = _measured_lines(source_stream, statistics)
+        result = csv.reader(source_stream, dialect, **_without_python2_keywords(keywords, _PYTHON2_READER_KEYWORDS))
+        if usecols is not None:
+            result = _TransformingReader(result, _column_selector(_checked_column_indexes(usecols), ''))
+        result = _with_interning(result, usecols, intern_columns, intern_limit)
+        result = _with_converters(result, usecols, converters, dtypes)
+        return _with_statistics(result, _MeasuringReader, statistics, progress, progress_every)
 
-        @fieldnames.setter
-        def fieldnames(self, value):
-            self._fieldnames = value
+    def _binary_lines_reader(binary_lines, encoding, dialect='excel', **keywords):
+        """
+        Same as `reader()` but for an iterable of lines of bytes in the ASCII
+        compatible ``encoding``.
+        """
+        return reader(map(operator.methodcaller('decode', encoding), binary_lines), dialect, **keywords)
 
-        @property
-        def line_num(self):
-            return self.reader.line_num
+    def writer(target_text_stream, dialect='excel', converters=None, dtypes=None, statistics=None, progress=None,
+               progress_every=_DEFAULT_BATCH_ROW_COUNT, **keywords):
+        """
+        Same as `csv.writer`.
+        """
+        assert target_text_stream is not None
 
+        if statistics is None and progress is not None:
+            statistics = Statistics()
+        if statistics is not None:
+            target_text_stream = _MeasuringStream(target_text_stream, statistics)
+        result = csv.writer(target_text_stream, dialect, **_without_python2_keywords(keywords, _PYTHON2_WRITER_KEYWORDS))
+        result = _with_formatters(result, converters, dtypes)
+        return _with_statistics(result, _MeasuringWriter, statistics, progress, progress_every)
 
-        def __next__(self):
-            if self.fieldnames is None:
+
+class _RecordLayout(object):
+    """
+    The information shared by all `Record` rows of a `DictReader`.
+    """
+
+    def __init__(self, fieldnames, restkey, restval):
+        self.fieldnames = fieldnames
+        self.restkey = restkey
+        self.restval = restval
+        self.fieldname_count = len(fieldnames)
+        # Similar to ``dict(zip(fieldnames, ...))``, the last of duplicate
+        # field names wins but the order of keys is the one they first occur.
+        self.fieldname_to_index = dict((fieldname, index) for index, fieldname in enumerate(fieldnames))
+        self.keys = []
+        for fieldname in fieldnames:
+            if fieldname not in self.keys:
+                self.keys.append(fieldname)
+        self.has_restkey_field = restkey in self.fieldname_to_index
+
+
+class Record(Mapping):
+    """
+    A read only mapping of field names to values as returned by
+    `DictReader` with ``row_type='record'``. Records support the same
+    operations as a ``dict`` without modifications. To convert a record to a
+    ``dict``, use ``dict(record)``.
+
+    Instead of a hash table for each row, all records of a reader share the
+    mapping of field names to indexes, which needs considerably less memory.
+    """
+    __slots__ = ('_layout', '_values')
+
+    def __init__(self, layout, values):
+        self._layout = layout
+        self._values = values
+
+    def _has_rest(self):
+        return len(self._values) > self._layout.fieldname_count
+
+    def __getitem__(self, key):
+        layout = self._layout
+        if key == layout.restkey and self._has_rest():
+            return self._values[layout.fieldname_count:]
+        index = layout.fieldname_to_index[key]
+        if index < len(self._values):
+            return self._values[index]
+        return layout.restval
+
+    def __iter__(self):
+        layout = self._layout
+        for key in layout.keys:
+            yield key
+        if self._has_rest() and not layout.has_restkey_field:
+            yield layout.restkey
+
+    def __len__(self):
+        result = len(self._layout.keys)
+        if self._has_rest() and not self._layout.has_restkey_field:
+            result += 1
+        return result
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, dict(self))
+
+
+#: Possible values for the ``row_type`` of a `DictReader`.
+_ROW_TYPES = ('dict', 'record')
+
+
+class _TransformingReader(object):
+    """
+    A reader that returns the rows of ``csv_reader`` after passing them to
+    ``transform``.
+    """
+
+    def __init__(self, csv_reader, transform):
+        self.reader = csv_reader
+        self._transform = transform
+
+    @property
+    def dialect(self):
+        return self.reader.dialect
+
+    @property
+    def line_num(self):
+        return self.reader.line_num
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self._transform(next(self.reader))
+
+    def next(self):
+        return self.__next__()
+
+
+class _TransformingWriter(object):
+    """
+    A writer that passes rows to ``csv_writer`` after passing them to
+    ``transform``.
+    """
+
+    def __init__(self, csv_writer, transform):
+        self.writer = csv_writer
+        self._transform = transform
+
+    @property
+    def dialect(self):
+        return self.writer.dialect
+
+    def writerow(self, row):
+        return self.writer.writerow(self._transform(list(row)))
+
+    def writerows(self, rows):
+        return self.writer.writerows(self._transform(list(row)) for row in rows)
+
+
+def _with_formatters(csv_writer, converters, dtypes):
+    """
+    ``csv_writer`` with the columns in ``converters`` and ``dtypes``
+    converted before writing them.
+    """
+    if converters or dtypes:
+        positions_and_converters = _compiled_converters(
+            converters, dtypes, _DTYPE_TO_FORMATTER, _index_position_function(None))
+        if positions_and_converters:
+            csv_writer = _TransformingWriter(csv_writer, _row_converter(positions_and_converters))
+    return csv_writer
+
+
+class DictReader(object):
+    def __init__(self, input_stream, fieldnames=None, restkey=None, restval=None,
+                 dialect="excel", *args, **kwds):
+        self.usecols = kwds.pop('usecols', None)
+        self.converters = kwds.pop('converters', None)
+        self.dtypes = kwds.pop('dtypes', None)
+        self.intern_columns = kwds.pop('intern_columns', None)
+        self.intern_limit = kwds.pop('intern_limit', _DEFAULT_INTERN_LIMIT)
+        self.row_type = kwds.pop('row_type', 'dict')
+        if self.row_type not in _ROW_TYPES:
+            raise ValueError('row_type is %r but must be one of: %s' % (self.row_type, ', '.join(_ROW_TYPES)))
+        self._fieldnames = fieldnames
+        self.restkey = restkey
+        self.restval = restval
+        self.reader = self._create_reader(input_stream, dialect, *args, **kwds)
+        self.dialect = dialect
+        self._record_layout = None
+        # Field names and functions to select, intern and convert the
+        # columns of a row according to `usecols`, `intern_columns`,
+        # `converters` and `dtypes`.
+        self._row_fieldnames = None
+        self._select_columns = None
+        self._intern_row = None
+        self._convert_row = None
+
+    def _create_reader(self, input_stream, dialect, *args, **kwds):
+        return reader(input_stream, dialect, *args, **kwds)
+
+    @property
+    def statistics(self):
+        """
+        The `Statistics` of `reader` or ``None`` if it does not collect any.
+        """
+        return getattr(self.reader, 'statistics', None)
+
+    def __iter__(self):
+        return self
+
+    def _set_fieldnames_from_first_row(self):
+        assert self._fieldnames is None
+        self._fieldnames = next(self.reader)
+
+    @property
+    def fieldnames(self):
+        if self._fieldnames is None:
+            try:
                 self._set_fieldnames_from_first_row()
-            fieldvalues = next(self.reader)
+            except StopIteration:
+                pass
+        return self._fieldnames
 
-            # Skip empty lines to avoid lists of None.
-            while len(fieldvalues) == 0:
-                fieldvalues = next(self.reader)
-
-            result = dict(zip(self.fieldnames, fieldvalues))
-            fieldnames_count = len(self.fieldnames)
-            fieldvalue_count = len(fieldvalues)
-            if fieldnames_count < fieldvalue_count:
-                result[self.restkey] = fieldvalues[fieldnames_count:]
-            elif fieldnames_count > fieldvalue_count:
-                for key in self.fieldnames[fieldvalue_count:]:
-                    result[key] = self.restval
-            return result
+    @fieldnames.setter
+    def fieldnames(self, value):
+        self._fieldnames = value
+
+    @property
+    def line_num(self):
+        return self.reader.line_num
 
-        def next(self):
-            return self.__next__()
 
+    def _prepare_row_fieldnames(self):
+        """
+        Resolve `usecols`, `intern_columns`, `converters` and `dtypes`
+        against the current `fieldnames` unless this already happened.
+        """
+        if self._row_fieldnames is not None and self._row_fieldnames[0] is self._fieldnames:
+            return
+        if self.usecols is None:
+            column_indexes = None
+            row_fieldnames = self._fieldnames
+        else:
+            column_indexes = _checked_column_indexes([self._column_index(column) for column in self.usecols])
+            row_fieldnames = [self._fieldnames[column_index] for column_index in column_indexes]
+            if hasattr(self.reader, '_select_columns'):
+                # Let the reader skip the other columns as early as possible.
+                self.reader._select_columns(column_indexes, None)
+                self._select_columns = None
+            else:
+                self._select_columns = _column_selector(column_indexes, None)
+        if column_indexes is None:
+            column_position = self._column_index
+        else:
+            column_indexes_list = list(column_indexes)
 
-    class DictWriter:
-        def __init__(self, stream, fieldnames, restval="", extrasaction='raise',
-                     dialect='excel', *args, **kwds):
-            self.fieldnames = fieldnames
-            self.restval = restval
-            if extrasaction.lower() not in ('ignore', 'raise'):
+            def column_position(column):
+                column_index = self._column_index(column)
+                if column_index not in column_indexes_list:
+                    raise ValueError('column %r must be one of usecols: %s' % (column, self.usecols))
+                return column_indexes_list.index(column_index)
+
+        self._intern_row = None
+        if self.intern_columns:
+            self._intern_row = _row_interner(
+                [column_position(column) for column in self.intern_columns], self.intern_limit)
+        self._convert_row = None
+        if self.converters or self.dtypes:
+            positions_and_converters = _compiled_converters(
+                self.converters, self.dtypes, _DTYPE_TO_CONVERTER, column_position)
+            if positions_and_converters:
+                self._convert_row = _row_converter(positions_and_converters)
+        self._row_fieldnames = (self._fieldnames, row_fieldnames)
+
+    def _column_index(self, column):
+        """
+        The index of ``column``, which is a field name or column index.
+        """
+        if isinstance(column, numbers.Integral):
+            if not 0 <= column < len(self._fieldnames):
                 raise ValueError(
-                    "extrasaction (%s) must be 'raise' or 'ignore'" %
-                    extrasaction)
-            self.extrasaction = extrasaction
-            self.writer = writer(stream, dialect, *args, **kwds)
-
-        def writeheader(self):
-            header = dict(zip(self.fieldnames, self.fieldnames))
-            self.writerow(header)
-
-        def _dict_to_list(self, row_dict):
-            if self.extrasaction == 'raise':
-                unknown_fields = [
-                    key for key in row_dict if key not in self.fieldnames
-                    ]
-                if unknown_fields:
-                    raise ValueError(
-                        "dict contains fields not in fieldnames: " +
-                        ", ".join([repr(x) for x in unknown_fields]))
-            return [row_dict.get(key, self.restval) for key in self.fieldnames]
-
-        def writerow(self, row_dict):
-            return self.writer.writerow(self._dict_to_list(row_dict))
-
-        def writerows(self, row_dicts):
-            rows = []
-            for row_dict in row_dicts:
-                rows.append(self._dict_to_list(row_dict))
-            return self.writer.writerows(rows)
+                    'column index is %d but must be between 0 and %d' % (column, len(self._fieldnames) - 1))
+            return column
+        try:
+            return self._fieldnames.index(column)
+        except ValueError:
+            raise ValueError('column is %r but must be one of: %s' % (column, self._fieldnames))
+
+    def __next__(self):
+        if self.fieldnames is None:
+            self._set_fieldnames_from_first_row()
+        self._prepare_row_fieldnames()
+        fieldvalues = next(self.reader)
+
+        # Skip empty lines to avoid lists of None.
+        while len(fieldvalues) == 0:
+            fieldvalues = next(self.reader)
+
+        return self._fieldvalues_to_dict(fieldvalues)
+
+    def _fieldvalues_to_dict(self, fieldvalues):
+        if self._select_columns is not None:
+            fieldvalues = self._select_columns(fieldvalues)
+        # With usecols, missing columns are None while parsed ones never are.
+        missing_positions = None
+        if self.usecols is not None and None in fieldvalues:
+            missing_positions = [position for position, value in enumerate(fieldvalues) if value is None]
+        if self._intern_row is not None:
+            fieldvalues = self._intern_row(fieldvalues)
+        if self._convert_row is not None:
+            fieldvalues = self._convert_row(fieldvalues)
+        if missing_positions is not None:
+            for position in missing_positions:
+                fieldvalues[position] = self.restval
+        fieldnames = self._row_fieldnames[1]
+        if self.row_type == 'record':
+            return Record(self._current_record_layout(fieldnames), fieldvalues)
+
+        result = dict(zip(fieldnames, fieldvalues))
+        fieldnames_count = len(fieldnames)
+        fieldvalue_count = len(fieldvalues)
+        if fieldnames_count < fieldvalue_count:
+            result[self.restkey] = fieldvalues[fieldnames_count:]
+        elif fieldnames_count > fieldvalue_count:
+            for key in fieldnames[fieldvalue_count:]:
+                result[key] = self.restval
+        return result
+
+    def _current_record_layout(self, fieldnames):
+        layout = self._record_layout
+        if layout is None or layout.fieldnames is not fieldnames \
+                or layout.restkey is not self.restkey or layout.restval is not self.restval:
+            layout = _RecordLayout(fieldnames, self.restkey, self.restval)
+            self._record_layout = layout
+        return layout
+
+    def next(self):
+        return self.__next__()
+
+
+class DictWriter(object):
+    """
+    Same as `csv.DictWriter` but rows can also be tuples or lists with the
+    values in the order of ``fieldnames``, which skips looking up the values
+    by key.
+    """
+
+    def __init__(self, stream, fieldnames, restval="", extrasaction='raise',
+                 dialect='excel', *args, **kwds):
+        self.fieldnames = fieldnames
+        self.restval = restval
+        if extrasaction.lower() not in ('ignore', 'raise'):
+            raise ValueError(
+                "extrasaction (%s) must be 'raise' or 'ignore'" %
+                extrasaction)
+        self.extrasaction = extrasaction
+        converters = kwds.pop('converters', None)
+        dtypes = kwds.pop('dtypes', None)
+        self._convert_row = None
+        if converters or dtypes:
+            positions_and_converters = _compiled_converters(
+                converters, dtypes, _DTYPE_TO_FORMATTER, self._fieldname_position)
+            if positions_and_converters:
+                self._convert_row = _row_converter(positions_and_converters)
+        self.writer = self._create_writer(stream, dialect, *args, **kwds)
+
+    @property
+    def fieldnames(self):
+        return self._fieldnames
+
+    @fieldnames.setter
+    def fieldnames(self, value):
+        # Precompute what every row needs to look up its values and check for
+        # extra keys, which requires a sequence.
+        value = list(value)
+        self._fieldnames = value
+        self._fieldname_set = frozenset(value)
+        self._fieldname_count = len(value)
+        if self._fieldname_count == 1:
+            get_single_value = operator.itemgetter(value[0])
+            self._get_values = lambda row_dict: (get_single_value(row_dict),)
+        elif self._fieldname_count >= 2:
+            self._get_values = operator.itemgetter(*value)
+        else:
+            self._get_values = lambda _: ()
+
+    def _fieldname_position(self, fieldname):
+        try:
+            return self.fieldnames.index(fieldname)
+        except ValueError:
+            raise ValueError('fieldname is %r but must be one of: %s' % (fieldname, self.fieldnames))
+
+    def _create_writer(self, stream, dialect, *args, **kwds):
+        return writer(stream, dialect, *args, **kwds)
+
+    @property
+    def statistics(self):
+        """
+        The `Statistics` of `writer` or ``None`` if it does not collect any.
+        """
+        return getattr(self.writer, 'statistics', None)
+
+    def writeheader(self):
+        header = dict(zip(self.fieldnames, self.fieldnames))
+        return self.writer.writerow(self._dict_to_list(header))
+
+    def _dict_to_list(self, row_dict):
+        if isinstance(row_dict, (tuple, list)):
+            return self._sequence_to_list(row_dict)
+        if self.extrasaction == 'raise' and not self._fieldname_set.issuperset(row_dict):
+            unknown_fields = [
+                key for key in row_dict if key not in self._fieldname_set
+                ]
+            raise ValueError(
+                "dict contains fields not in fieldnames: " +
+                ", ".join([repr(x) for x in unknown_fields]))
+        row_type = type(row_dict)
+        # Looking up the values with the item getter would call `__missing__`
+        # of types like `defaultdict` instead of using the restval.
+        if row_type is dict or not hasattr(row_type, '__missing__'):
+            try:
+                return list(self._get_values(row_dict))
+            except KeyError:
+                # Some fields are missing and need the restval.
+                pass
+        return [row_dict.get(key, self.restval) for key in self.fieldnames]
+
+    def _sequence_to_list(self, row_values):
+        value_count = len(row_values)
+        if value_count == self._fieldname_count:
+            return list(row_values)
+        if value_count < self._fieldname_count:
+            return list(row_values) + [self.restval] * (self._fieldname_count - value_count)
+        if self.extrasaction == 'raise':
+            raise ValueError(
+                'row has %d values but must have at most %d: %r' % (value_count, self._fieldname_count, row_values))
+        return list(row_values[:self._fieldname_count])
+
+    def _dict_to_row(self, row_dict):
+        result = self._dict_to_list(row_dict)
+        if self._convert_row is not None:
+            result = self._convert_row(result)
+        return result
+
+    def writerow(self, row_dict):
+        return self.writer.writerow(self._dict_to_row(row_dict))
+
+    def writerows(self, row_dicts):
+        return self.writer.writerows(self._dict_to_row(row_dict) for row_dict in row_dicts)
+
+
+def read_rows(csv_reader, row_count):
+    """
+    List of at most ``row_count`` rows read from ``csv_reader``, which can be
+    any reader from `reader()` or `DictReader`. An empty list means that all
+    rows have been read.
+    """
+    assert csv_reader is not None
+    assert row_count >= 0
+
+    reader_read_rows = getattr(csv_reader, 'read_rows', None)
+    if reader_read_rows is not None:
+        return reader_read_rows(row_count)
+    return list(itertools.islice(csv_reader, row_count))
+
+
+def iter_batches(csv_reader, batch_row_count=_DEFAULT_BATCH_ROW_COUNT):
+    """
+    Lists of at most ``batch_row_count`` rows read from ``csv_reader`` until
+    all rows have been read.
+    """
+    assert batch_row_count >= 1
+
+    rows = read_rows(csv_reader, batch_row_count)
+    while rows:
+        yield rows
+        rows = read_rows(csv_reader, batch_row_count)
+
+
+#: Names ``from csv342 import *`` imports, which are the same as for `csv` and
+#: the additional features except `open()` because it would replace the
+#: builtin ``open()``.
+__all__ = [name for name in csv.__all__ if not name.startswith('__')] + [
+    'IS_PYTHON2',
+    'Record',
+    'Statistics',
+    'iter_batches',
+    'read_rows',
+] + [name for name in _EXTRAS_NAMES if name != 'open']
+
+if sys.version_info < (3, 7):
+    import types
+
+    class _LazyFeaturesModule(types.ModuleType):
+        """
+        Stand-in for csv342 that resolves missing attributes using the
+        module's ``__getattr__()``, which Python only does by itself since
+        version 3.7.
+        """
+
+        def __init__(self, module):
+            super(_LazyFeaturesModule, self).__init__(module.__name__, module.__doc__)
+            self.__dict__.update(module.__dict__)
+            # Keep the module alive, which otherwise under Python 2 would
+            # clear the globals its functions use.
+            self._module = module
+
+        def __getattr__(self, name):
+            result = __getattr__(name)
+            setattr(self, name, result)
+            return result
+
+    sys.modules[__name__] = _LazyFeaturesModule(sys.modules[__name__])
 
 
 if __name__ == '__main__':
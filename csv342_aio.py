@@ -0,0 +1,301 @@
+"""
+Asynchronous CSV reading and writing for csv342 using asyncio, for example
+with a ``asyncio.StreamReader`` and ``asyncio.StreamWriter``. This requires
+Python 3.6 or later.
+
+It is distributed under the BSD license with the source code available from
+https://github.com/roskakori/csv342.
+"""
+# Copyright (c) 2016-2020, Thomas Aglassinger
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of csv342 nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import codecs
+import collections
+import inspect
+import io
+
+import csv342
+
+#: Default number of bytes to read from the source stream at once.
+_DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class AsyncReader:
+    """
+    A CSV reader for ``source_stream``, which must have a coroutine
+    ``read(size)`` or ``readline()`` returning ``bytes`` (decoded using
+    ``encoding``) or ``str``. Rows can be obtained using ``async for``.
+
+    To find out when a record is complete before passing it to the parser,
+    the ``quotechar`` must only be used for quoting. An ``escapechar`` is not
+    supported.
+    """
+
+    def __init__(self, source_stream, dialect='excel', encoding='utf-8', errors='strict',
+                 chunk_size=_DEFAULT_CHUNK_SIZE, **keywords):
+        assert source_stream is not None
+        assert chunk_size >= 1
+
+        self._source_stream = source_stream
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors)
+        dialect_keywords = csv342._dialect_keywords(dialect, keywords)
+        self._quotechar = csv342._record_quotechar(dialect_keywords)
+        self._pending_text = ''
+        self._record_lines = []
+        self._is_quoted = False
+        self._is_at_end = False
+        # Lines of complete records the parser can consume without running
+        # out of data in the middle of a record.
+        self._ready_lines = collections.deque()
+        self._parser = csv342.reader(_LineQueue(self._ready_lines), dialect, **keywords)
+        self.dialect = dialect
+
+    @property
+    def line_num(self):
+        return self._parser.line_num
+
+    async def _read_text(self):
+        read = getattr(self._source_stream, 'read', None)
+        if read is not None:
+            data = await read(self._chunk_size)
+        else:
+            data = await self._source_stream.readline()
+        if isinstance(data, bytes):
+            result = self._decoder.decode(data, final=not data)
+        else:
+            result = data
+        if not data:
+            self._is_at_end = True
+        return result
+
+    def _add_line(self, line):
+        self._record_lines.append(line)
+        if self._quotechar is not None and line.count(self._quotechar) % 2 == 1:
+            self._is_quoted = not self._is_quoted
+        if not self._is_quoted:
+            self._ready_lines.extend(self._record_lines)
+            self._record_lines = []
+
+    async def _read_lines(self):
+        self._pending_text += await self._read_text()
+        lines = io.StringIO(self._pending_text, newline='').readlines()
+        if self._is_at_end:
+            self._pending_text = ''
+        elif lines and lines[-1][-1] != '\n':
+            # Keep the last line because it might be incomplete or end with
+            # a '\r' that is followed by a '\n' in the next chunk.
+            self._pending_text = lines.pop()
+        else:
+            self._pending_text = ''
+        for line in lines:
+            self._add_line(line)
+        if self._is_at_end and self._record_lines:
+            # Let the parser decide what to do with an unterminated quote.
+            self._ready_lines.extend(self._record_lines)
+            self._record_lines = []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._ready_lines:
+            if self._is_at_end:
+                raise StopAsyncIteration()
+            await self._read_lines()
+        return next(self._parser)
+
+    async def read_rows(self, row_count):
+        """
+        List of at most ``row_count`` rows; an empty list means that all
+        rows have been read.
+        """
+        result = []
+        async for row in self:
+            result.append(row)
+            if len(result) >= row_count:
+                break
+        return result
+
+
+class _LineQueue:
+    """
+    Iterator over the lines in ``lines``, which can be extended after the
+    iterator ran out of lines.
+    """
+
+    def __init__(self, lines):
+        self._lines = lines
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return self._lines.popleft()
+        except IndexError:
+            raise StopIteration()
+
+
+class AsyncWriter:
+    """
+    A CSV writer for ``target_stream``, which must have a ``write(data)``
+    method that optionally can be a coroutine, for example a
+    ``asyncio.StreamWriter``. Unless ``encoding`` is ``None``, the data
+    written are ``bytes``. If the target stream has a coroutine ``drain()``,
+    it is awaited after each write.
+    """
+
+    def __init__(self, target_stream, dialect='excel', encoding='utf-8', errors='strict', **keywords):
+        assert target_stream is not None
+
+        self._target_stream = target_stream
+        self._encoding = encoding
+        self._errors = errors
+        self._buffer = io.StringIO(newline='')
+        self._csv_writer = csv342.writer(self._buffer, dialect, **keywords)
+        self.dialect = dialect
+
+    async def _write_buffer(self):
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate(0)
+        if data:
+            if self._encoding is not None:
+                data = data.encode(self._encoding, self._errors)
+            written = self._target_stream.write(data)
+            if inspect.isawaitable(written):
+                await written
+            drain = getattr(self._target_stream, 'drain', None)
+            if drain is not None:
+                await drain()
+
+    async def writerow(self, row):
+        result = self._csv_writer.writerow(row)
+        await self._write_buffer()
+        return result
+
+    async def writerows(self, rows, batch_row_count=csv342._DEFAULT_BATCH_ROW_COUNT):
+        """
+        Write all ``rows``, which can be an iterable or asynchronous iterable,
+        in batches of ``batch_row_count`` rows.
+        """
+        row_count_in_batch = 0
+        try:
+            if hasattr(rows, '__aiter__'):
+                async for row in rows:
+                    self._csv_writer.writerow(row)
+                    row_count_in_batch += 1
+                    if row_count_in_batch >= batch_row_count:
+                        await self._write_buffer()
+                        row_count_in_batch = 0
+            else:
+                for row in rows:
+                    self._csv_writer.writerow(row)
+                    row_count_in_batch += 1
+                    if row_count_in_batch >= batch_row_count:
+                        await self._write_buffer()
+                        row_count_in_batch = 0
+        finally:
+            await self._write_buffer()
+
+
+def reader(source_stream, dialect='excel', **keywords):
+    """
+    Same as `csv342.reader()` but for an asynchronous ``source_stream``, see
+    `AsyncReader`.
+    """
+    return AsyncReader(source_stream, dialect, **keywords)
+
+
+def writer(target_stream, dialect='excel', **keywords):
+    """
+    Same as `csv342.writer()` but for an asynchronous ``target_stream``, see
+    `AsyncWriter`.
+    """
+    return AsyncWriter(target_stream, dialect, **keywords)
+
+
+class DictReader(csv342.DictReader):
+    """
+    Same as `csv342.DictReader` but for an asynchronous ``source_stream``, see
+    `AsyncReader`. Rows can be obtained using ``async for``. Unless
+    specified, `fieldnames` are available after the first row has been read.
+    """
+
+    def _create_reader(self, source_stream, dialect, *args, **kwds):
+        return AsyncReader(source_stream, dialect, *args, **kwds)
+
+    @property
+    def fieldnames(self):
+        return self._fieldnames
+
+    @fieldnames.setter
+    def fieldnames(self, value):
+        self._fieldnames = value
+
+    def __next__(self):
+        raise TypeError('use "async for" to read rows')
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._fieldnames is None:
+            self._fieldnames = await self.reader.__anext__()
+        self._prepare_row_fieldnames()
+        fieldvalues = await self.reader.__anext__()
+
+        # Skip empty lines to avoid lists of None.
+        while len(fieldvalues) == 0:
+            fieldvalues = await self.reader.__anext__()
+
+        return self._fieldvalues_to_dict(fieldvalues)
+
+
+class DictWriter(csv342.DictWriter):
+    """
+    Same as `csv342.DictWriter` but for an asynchronous ``target_stream``,
+    see `AsyncWriter`.
+    """
+
+    def _create_writer(self, target_stream, dialect, *args, **kwds):
+        return AsyncWriter(target_stream, dialect, *args, **kwds)
+
+    async def writeheader(self):
+        return await self.writer.writerow(self._dict_to_list(dict(zip(self.fieldnames, self.fieldnames))))
+
+    async def writerow(self, row_dict):
+        return await self.writer.writerow(self._dict_to_row(row_dict))
+
+    async def writerows(self, row_dicts, batch_row_count=csv342._DEFAULT_BATCH_ROW_COUNT):
+        if hasattr(row_dicts, '__aiter__'):
+            rows = (self._dict_to_row(row_dict) async for row_dict in row_dicts)
+        else:
+            rows = (self._dict_to_row(row_dict) for row_dict in row_dicts)
+        await self.writer.writerows(rows, batch_row_count)
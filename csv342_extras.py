@@ -0,0 +1,1904 @@
+"""
+Additional features of csv342 like `open()` with transparent compression,
+memory mapped, indexed, parallel and incremental reading, dialect detection,
+pipelines and reading columns into arrays.
+
+Use them as attributes of csv342, for example ``csv342.open()``. csv342
+only imports this module once one of them is accessed, which keeps
+importing csv342 fast.
+
+It is distributed under the BSD license with the source code available from
+https://github.com/roskakori/csv342.
+"""
+# Copyright (c) 2016-2020, Thomas Aglassinger
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of csv342 nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+from __future__ import unicode_literals
+
+import codecs
+import collections
+import io
+import itertools
+import os
+import re
+import sys
+import time
+
+try:
+    from _thread import allocate_lock as _allocate_lock
+except ImportError:  # Python 2
+    from thread import allocate_lock as _allocate_lock
+
+from csv342 import (
+    Dialect, DictReader, DictWriter, Error, Mapping, QUOTE_MINIMAL, _DEFAULT_BATCH_ROW_COUNT, _EXTRAS_NAMES,
+    _LazyModule, _ascii_compatible_encoding, _binary_lines_reader, _checked_column_indexes, _column_selector,
+    _dialect_keywords, _is_binary_stream, _record_quotechar, _utf8_bom_size, iter_batches, reader, writer)
+
+heapq = _LazyModule('heapq', namespace=globals())
+json = _LazyModule('json', namespace=globals())
+mmap = _LazyModule('mmap', namespace=globals())
+multiprocessing = _LazyModule('multiprocessing', namespace=globals())
+numbers = _LazyModule('numbers', namespace=globals())
+queue = _LazyModule('Queue' if sys.version_info[0] == 2 else 'queue', 'queue', namespace=globals())
+tempfile = _LazyModule('tempfile', namespace=globals())
+threading = _LazyModule('threading', namespace=globals())
+
+
+#: Default number of bytes `open()` buffers when reading or writing.
+_DEFAULT_OPEN_BUFFER_SIZE = 1024 * 1024
+
+_SUFFIX_TO_COMPRESSION = {
+    '.bz2': 'bz2',
+    '.gz': 'gzip',
+    '.gzip': 'gzip',
+    '.lzma': 'xz',
+    '.xz': 'xz',
+    '.zst': 'zstd',
+}
+
+COMPRESSIONS = ('bz2', 'gzip', 'xz', 'zstd')
+
+
+class _RawFileAdapter(io.RawIOBase):
+    """
+    The file like ``compressed_file`` as raw stream that can be buffered
+    with `io.BufferedReader` respectively `io.BufferedWriter`, which also
+    works with compressed files that are not based on `io`, for example
+    `bz2.BZ2File` under Python 2.
+    """
+
+    def __init__(self, compressed_file, is_reading):
+        super(_RawFileAdapter, self).__init__()
+        self._compressed_file = compressed_file
+        self._is_reading = is_reading
+
+    def readable(self):
+        return self._is_reading
+
+    def writable(self):
+        return not self._is_reading
+
+    def readinto(self, buffer):
+        data = self._compressed_file.read(len(buffer))
+        data_size = len(data)
+        buffer[:data_size] = data
+        return data_size
+
+    def write(self, data):
+        self._compressed_file.write(data.tobytes() if isinstance(data, memoryview) else bytes(data))
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._compressed_file.close()
+            finally:
+                super(_RawFileAdapter, self).close()
+
+
+def _compressed_binary_file(path, binary_mode, compression):
+    if compression == 'gzip':
+        import gzip
+        return gzip.GzipFile(path, binary_mode)
+    if compression == 'bz2':
+        import bz2
+        return bz2.BZ2File(path, binary_mode)
+    if compression == 'xz':
+        try:
+            import lzma
+        except ImportError:
+            raise ImportError('lzma must be available to use xz compression')
+        return lzma.LZMAFile(path, binary_mode)
+    assert compression == 'zstd', 'compression=%r' % compression
+    try:
+        from compression import zstd
+    except ImportError:
+        try:
+            import zstandard as zstd
+        except ImportError:
+            raise ImportError('zstandard must be installed to use zstd compression')
+    return zstd.open(path, binary_mode)
+
+
+def open(path, mode='r', encoding='utf-8', errors='strict', newline='', compression='infer',
+         buffer_size=_DEFAULT_OPEN_BUFFER_SIZE):
+    """
+    Similar to `io.open()` but with ``newline=''`` as needed by `reader()`
+    and `writer()`, UTF-8 as default ``encoding``, large buffers and
+    transparent compression, which is decompressed respectively compressed
+    while reading respectively writing. In binary mode, ``encoding``,
+    ``errors`` and ``newline`` are ignored.
+
+    Possible values for ``compression`` are one of `COMPRESSIONS`, ``None``
+    for none, or ``'infer'`` to derive it from the suffix of ``path``, for
+    example ``'.gz'`` for gzip. Compression with xz requires Python 3, and
+    with zstd it requires Python 3.14 or the ``zstandard`` package.
+    """
+    assert path is not None
+    assert buffer_size >= 1
+    if not (mode and mode[0] in 'arwx' and set(mode[1:]) <= set('bt') and len(mode) <= 2):
+        raise ValueError("mode is %r but must be one of 'r', 'w', 'a' or 'x' optionally followed by 'b' or 't'" % mode)
+    if compression == 'infer':
+        compression = _SUFFIX_TO_COMPRESSION.get(os.path.splitext(path)[1].lower())
+    elif compression is not None and compression not in COMPRESSIONS:
+        raise ValueError('compression is %r but must be one of: %s' % (compression, ', '.join(COMPRESSIONS)))
+    is_binary = 'b' in mode
+    if compression is None:
+        if is_binary:
+            return io.open(path, mode, buffering=buffer_size)
+        return io.open(path, mode, buffering=buffer_size, encoding=encoding, errors=errors, newline=newline)
+
+    is_reading = mode[0] == 'r'
+    raw_file = _RawFileAdapter(_compressed_binary_file(path, str(mode[0] + 'b'), compression), is_reading)
+    buffered_class = io.BufferedReader if is_reading else io.BufferedWriter
+    result = buffered_class(raw_file, buffer_size)
+    if not is_binary:
+        result = io.TextIOWrapper(result, encoding=encoding, errors=errors, newline=newline)
+    return result
+
+
+class MmapReader(object):
+    """
+    A CSV reader for the file at ``path`` that parses the file from a memory
+    map instead of reading it line by line, which avoids copying the data
+    for large files. The file must use an ASCII compatible ``encoding``, for
+    example UTF-8 or CP1252. With UTF-8, a byte order mark at the start of
+    the file is skipped.
+
+    After each row, `offset` is the byte offset where the row starts in the
+    file. Passing such an offset to `seek()` continues reading from that row.
+    """
+
+    def __init__(self, path, encoding='utf-8', dialect='excel', **keywords):
+        assert path is not None
+        encoding = _ascii_compatible_encoding(encoding)
+
+        self._file = io.open(path, 'rb')
+        self._encoding = encoding
+        self._keywords = keywords
+        self.dialect = dialect
+        self.offset = None
+        try:
+            if os.fstat(self._file.fileno()).st_size > 0:
+                self._mapping = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                # Empty files cannot be mapped.
+                self._mapping = io.BytesIO()
+            self._create_parser()
+        except:
+            self._file.close()
+            raise
+
+    def _create_parser(self):
+        if self._mapping.tell() == 0:
+            self._mapping.seek(_utf8_bom_size(self._mapping.read(len(codecs.BOM_UTF8)), self._encoding))
+        self.reader = _binary_lines_reader(
+            iter(self._mapping.readline, b''), self._encoding, self.dialect, **self._keywords)
+
+    @property
+    def line_num(self):
+        return self.reader.line_num
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        # The parser only pulls as many lines as the next row needs, so the
+        # current position of the mapping is where the next row starts.
+        offset = self._mapping.tell()
+        result = next(self.reader)
+        self.offset = offset
+        return result
+
+    def next(self):
+        return self.__next__()
+
+    def seek(self, offset):
+        """
+        Continue reading with the row starting at byte ``offset``, which
+        usually has been obtained from `offset` before. This also resets
+        `line_num`.
+        """
+        self._mapping.seek(offset)
+        # Start with a new parser because the old one might have reached the
+        # end of the mapping already, after which it would not read any more.
+        self._create_parser()
+
+    def close(self):
+        self._mapping.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error_value, traceback):
+        self.close()
+
+
+def mmap_reader(path, encoding='utf-8', dialect='excel', **keywords):
+    """
+    Same as `reader()` but for the file at ``path``, which is parsed from a
+    memory map, see `MmapReader`.
+    """
+    return MmapReader(path, encoding, dialect, **keywords)
+
+
+#: Default number of bytes `parallel_reader()` passes to a worker at once.
+_DEFAULT_PARALLEL_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def _record_ranges(data, chunk_size, quotechar):
+    """
+    Pairs of ``(start, end)`` byte offsets splitting ``data`` into ranges of
+    at least ``chunk_size`` bytes that each contain only complete records.
+    Line breaks inside of quotes are recognized by counting the
+    ``quotechar`` bytes, which works because escaped quotes are doubled.
+    """
+    data_size = len(data)
+    start = 0
+    while start < data_size:
+        end = min(start + chunk_size, data_size)
+        is_quoted = quotechar is not None and data[start:end].count(quotechar) % 2 == 1
+        while end < data_size:
+            newline_offset = data.find(b'\n', end)
+            if newline_offset == -1:
+                end = data_size
+            else:
+                if quotechar is not None and data[end:newline_offset].count(quotechar) % 2 == 1:
+                    is_quoted = not is_quoted
+                end = newline_offset + 1
+            if not is_quoted:
+                break
+        yield start, end
+        start = end
+
+
+def _read_record_range(path_range_encoding_and_keywords):
+    """
+    List of rows parsed from a byte range of a file, as used by the workers
+    of `parallel_reader()`.
+    """
+    path, start, end, encoding, keywords = path_range_encoding_and_keywords
+    with io.open(path, 'rb') as binary_file:
+        binary_file.seek(start)
+        data = binary_file.read(end - start)
+    if start == 0:
+        data = data[_utf8_bom_size(data, encoding):]
+    return list(_binary_lines_reader(io.BytesIO(data), encoding, **keywords))
+
+
+def parallel_reader(path, workers=None, dialect='excel', encoding='utf-8', chunk_size=_DEFAULT_PARALLEL_CHUNK_SIZE,
+                    ordered=True, **keywords):
+    """
+    Same as `reader()` but for the file at ``path``, which is split into
+    ranges of about ``chunk_size`` bytes that are parsed in parallel by a pool
+    of ``workers`` processes (by default one for each CPU).
+
+    Rows are yielded in the same order as in the file unless ``ordered`` is
+    ``False``, in which case rows from ranges that finish parsing first are
+    yielded first.
+
+    To find the boundaries between records, the file must use an ASCII
+    compatible ``encoding``, and the ``quotechar`` must only be used for
+    quoting. An ``escapechar`` is not supported.
+    """
+    assert path is not None
+    assert chunk_size >= 1
+    encoding = _ascii_compatible_encoding(encoding)
+
+    dialect_keywords = _dialect_keywords(dialect, keywords)
+    quotechar = _record_quotechar(dialect_keywords)
+    if quotechar is not None:
+        quotechar = quotechar.encode(encoding)
+
+    with io.open(path, 'rb') as binary_file:
+        if os.fstat(binary_file.fileno()).st_size == 0:
+            return
+        mapping = mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            record_ranges = list(_record_ranges(mapping, chunk_size, quotechar))
+        finally:
+            mapping.close()
+
+    work = [(path, start, end, encoding, dialect_keywords) for start, end in record_ranges]
+    pool = multiprocessing.Pool(workers)
+    try:
+        if ordered:
+            row_lists = pool.imap(_read_record_range, work)
+        else:
+            row_lists = pool.imap_unordered(_read_record_range, work)
+        for rows in row_lists:
+            for row in rows:
+                yield row
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _formatted_rows(rows_encoding_and_keywords):
+    """
+    The rows formatted as CSV and encoded to bytes, as used by the workers
+    of `ParallelWriter`.
+    """
+    rows, encoding, keywords = rows_encoding_and_keywords
+    with io.StringIO(newline='') as text_stream:
+        writer(text_stream, **keywords).writerows(rows)
+        return text_stream.getvalue().encode(encoding)
+
+
+class ParallelWriter(object):
+    """
+    A CSV writer for the file at ``path`` that formats batches of
+    ``batch_row_count`` rows in parallel using a pool of ``workers``
+    processes (by default one for each CPU) and writes the results in the
+    same order as the rows were passed. Use `parallel_writer()` to create
+    one.
+
+    Rows are passed to other processes, so their values, as well as the
+    ``converters``, must be picklable. For ``compression``, see `open()`.
+    """
+
+    def __init__(self, path, workers=None, dialect='excel', encoding='utf-8', compression='infer',
+                 batch_row_count=_DEFAULT_BATCH_ROW_COUNT, **keywords):
+        assert path is not None
+        if batch_row_count < 1:
+            raise ValueError('batch_row_count is %d but must be at least 1' % batch_row_count)
+        self._dialect_keywords = _dialect_keywords(dialect, keywords)
+        self._encoding = encoding
+        self.batch_row_count = batch_row_count
+        self._rows = []
+        self._pending_results = collections.deque()
+        worker_count = workers or multiprocessing.cpu_count()
+        # Limit the number of batches in progress so that the memory needed
+        # does not depend on how fast rows are passed.
+        self._max_pending_result_count = 2 * worker_count
+        self._target_file = open(path, 'wb', compression=compression)
+        try:
+            self._pool = multiprocessing.Pool(worker_count)
+        except:
+            self._target_file.close()
+            raise
+        self.dialect = dialect
+
+    def _write_result(self):
+        self._target_file.write(self._pending_results.popleft().get())
+
+    def _submit_rows(self):
+        if self._rows:
+            self._pending_results.append(self._pool.apply_async(
+                _formatted_rows, ((self._rows, self._encoding, self._dialect_keywords),)))
+            self._rows = []
+        while self._pending_results and (
+                len(self._pending_results) > self._max_pending_result_count or self._pending_results[0].ready()):
+            self._write_result()
+
+    def writerow(self, row):
+        # Copy the row in case the caller reuses it for the next row.
+        self._rows.append(list(row))
+        if len(self._rows) >= self.batch_row_count:
+            self._submit_rows()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def flush(self):
+        """
+        Wait until all rows passed so far are written.
+        """
+        self._submit_rows()
+        while self._pending_results:
+            self._write_result()
+        self._target_file.flush()
+
+    def close(self):
+        """
+        Write all remaining rows and close the file and the pool of workers.
+        """
+        try:
+            self.flush()
+            self._pool.close()
+        finally:
+            self._pool.terminate()
+            self._pool.join()
+            self._target_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error_value, traceback):
+        if error_type is None:
+            self.close()
+        else:
+            # Do not wait for the remaining rows when something went wrong.
+            self._pool.terminate()
+            self._pool.join()
+            self._target_file.close()
+
+
+def parallel_writer(path, workers=None, dialect='excel', encoding='utf-8', compression='infer',
+                    batch_row_count=_DEFAULT_BATCH_ROW_COUNT, **keywords):
+    """
+    Same as `writer()` but for the file at ``path``, where rows are
+    formatted in parallel, see `ParallelWriter`. Call its ``close()``
+    method or use it in a ``with`` statement to write all rows.
+    """
+    return ParallelWriter(path, workers, dialect, encoding, compression, batch_row_count, **keywords)
+
+
+#: Suffix `build_index()` appends to the path of a CSV file for its index.
+INDEX_SUFFIX = '.csv342-index'
+
+#: Default number of records between offsets stored in an index.
+_DEFAULT_INDEX_EVERY = 1000
+
+_INDEX_HEADER = b'csv342-index 1'
+
+
+def _record_offsets(data, quotechar):
+    """
+    Byte offsets where each record in ``data`` starts, where line breaks
+    inside of quotes are recognized in the same way as by `_record_ranges()`.
+    """
+    data.seek(0)
+    offset = 0
+    is_quoted = False
+    for line in iter(data.readline, b''):
+        if not is_quoted:
+            yield offset
+        if quotechar is not None and line.count(quotechar) % 2 == 1:
+            is_quoted = not is_quoted
+        offset += len(line)
+
+
+def _file_signature(path):
+    """
+    Size and modification time of the file at ``path`` to tell whether an
+    index still matches the file.
+    """
+    path_stat = os.stat(path)
+    return path_stat.st_size, repr(path_stat.st_mtime)
+
+
+def _replace_file(path, data):
+    """
+    Replace the content of the file at ``path`` with the bytes ``data`` in
+    one step, so that other processes never read an incomplete file, even
+    if several of them replace it at the same time.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    temp_fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=folder)
+    try:
+        with io.open(temp_fd, 'wb') as temp_file:
+            temp_file.write(data)
+        if os.name == 'nt' and os.path.exists(path):
+            os.remove(path)
+        os.rename(temp_path, path)
+    except:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def build_index(path, every=_DEFAULT_INDEX_EVERY, encoding='utf-8', dialect='excel', index_path=None, **keywords):
+    """
+    Build an index for the CSV file at ``path`` that contains the byte
+    offset of every ``every``-th record and the total number of records,
+    which enables `IndexedReader` to jump to any row without parsing the
+    rows before it. The index is stored in ``index_path``, by default the
+    ``path`` with `INDEX_SUFFIX` appended, which is returned.
+
+    The requirements concerning ``encoding`` and ``dialect`` are the same as
+    for `parallel_reader()`.
+    """
+    assert path is not None
+    assert every >= 1
+    encoding = _ascii_compatible_encoding(encoding)
+
+    quotechar = _record_quotechar(_dialect_keywords(dialect, keywords))
+    if quotechar is not None:
+        quotechar = quotechar.encode(encoding)
+    if index_path is None:
+        index_path = path + INDEX_SUFFIX
+
+    offsets = []
+    row_count = 0
+    with io.open(path, 'rb') as binary_file:
+        file_size, file_mtime = _file_signature(path)
+        if file_size > 0:
+            mapping = mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for row_count, offset in enumerate(_record_offsets(mapping, quotechar), 1):
+                    if (row_count - 1) % every == 0:
+                        offsets.append(offset)
+            finally:
+                mapping.close()
+
+    index_lines = [_INDEX_HEADER, ('%d %s %d %d' % (file_size, file_mtime, every, row_count)).encode('ascii')]
+    index_lines.extend(('%d' % offset).encode('ascii') for offset in offsets)
+    with io.open(index_path, 'wb') as index_file:
+        index_file.write(b'\n'.join(index_lines) + b'\n')
+    return index_path
+
+
+def _read_index(path, index_path):
+    """
+    Tuple ``(every, row_count, offsets)`` from the index at ``index_path``
+    or ``None`` if it does not exist or does not match the file at ``path``
+    anymore.
+    """
+    try:
+        with io.open(index_path, 'rb') as index_file:
+            index_lines = index_file.read().split(b'\n')
+    except (IOError, OSError):
+        return None
+    if len(index_lines) < 2 or index_lines[0] != _INDEX_HEADER:
+        raise ValueError('file must be an index built with build_index(): %s' % index_path)
+    file_size, file_mtime, every, row_count = index_lines[1].decode('ascii').split(' ')
+    if (int(file_size), file_mtime) != _file_signature(path):
+        return None
+    offsets = [int(offset) for offset in index_lines[2:] if offset]
+    return int(every), int(row_count), offsets
+
+
+class IndexedReader(MmapReader):
+    """
+    A `MmapReader` that can jump to any row using an index built with
+    `build_index()`, and supports ``len()``, indexing and slicing with row
+    numbers starting at 0. If the index does not exist yet or the file has
+    been modified since, the index is built again first.
+
+    Indexing and slicing move the current position of the reader, so
+    iterating afterwards continues after the last row returned.
+    """
+
+    def __init__(self, path, encoding='utf-8', dialect='excel', index_path=None, **keywords):
+        if index_path is None:
+            index_path = path + INDEX_SUFFIX
+        index = _read_index(path, index_path)
+        if index is None:
+            build_index(path, encoding=encoding, dialect=dialect, index_path=index_path, **keywords)
+            index = _read_index(path, index_path)
+        self._every, self._row_count, self._offsets = index
+        super(IndexedReader, self).__init__(path, encoding, dialect, **keywords)
+
+    def __len__(self):
+        return self._row_count
+
+    def seek_row(self, row_number):
+        """
+        Continue reading with the row at ``row_number``, where 0 is the first
+        row. Only the rows since the nearest indexed row are parsed.
+        """
+        if not 0 <= row_number <= self._row_count:
+            raise IndexError('row number is %d but must be between 0 and %d' % (row_number, self._row_count))
+        if row_number == self._row_count:
+            self.seek(self._mapping.size() if self._row_count else 0)
+        else:
+            self.seek(self._offsets[row_number // self._every])
+            for _ in range(row_number % self._every):
+                next(self)
+
+    def __getitem__(self, row_number_or_slice):
+        if isinstance(row_number_or_slice, slice):
+            start, stop, step = row_number_or_slice.indices(self._row_count)
+            if step < 0:
+                return [self[row_number] for row_number in range(start, stop, step)]
+            if start >= stop:
+                return []
+            self.seek_row(start)
+            return list(itertools.islice(self, 0, stop - start, step))
+        row_number = row_number_or_slice
+        if row_number < 0:
+            row_number += self._row_count
+        if not 0 <= row_number < self._row_count:
+            raise IndexError('row number is %d but must be between 0 and %d' % (row_number, self._row_count - 1))
+        self.seek_row(row_number)
+        return next(self)
+
+
+#: Suffix `follow()` appends to the path of a CSV file for its checkpoint.
+CHECKPOINT_SUFFIX = '.csv342-checkpoint'
+
+#: Default number of bytes `Follower` reads at once.
+_DEFAULT_FOLLOW_CHUNK_SIZE = 1024 * 1024
+
+_CHECKPOINT_HEADER = b'csv342-checkpoint 2'
+
+
+def _complete_records_size(data, quotechar):
+    """
+    Number of bytes at the start of ``data`` that consist of complete
+    records, which end with a line break outside of quotes. Line breaks
+    inside of quotes are recognized in the same way as by `_record_ranges()`.
+    """
+    result = data.rfind(b'\n') + 1
+    if quotechar is not None:
+        quote_count = data.count(quotechar, 0, result)
+        while quote_count % 2 == 1:
+            previous_result = result
+            result = data.rfind(b'\n', 0, result - 1) + 1
+            quote_count -= data.count(quotechar, result, previous_result)
+    return result
+
+
+def _file_identity(binary_file):
+    """
+    Device and inode of ``binary_file`` to tell whether a path still refers
+    to the same file.
+    """
+    file_stat = os.fstat(binary_file.fileno())
+    return file_stat.st_dev, file_stat.st_ino
+
+
+def _read_checkpoint(checkpoint_path):
+    """
+    Tuple ``(offset, file_identity)`` stored in the checkpoint at
+    ``checkpoint_path``, or ``(0, None)`` if it does not exist.
+    """
+    try:
+        with io.open(checkpoint_path, 'rb') as checkpoint_file:
+            checkpoint_lines = checkpoint_file.read().split(b'\n')
+    except (IOError, OSError):
+        return 0, None
+    if len(checkpoint_lines) < 3 or checkpoint_lines[0] != _CHECKPOINT_HEADER:
+        raise ValueError('file must be a checkpoint saved by follow(): %s' % checkpoint_path)
+    file_identity = tuple(int(number) for number in checkpoint_lines[2].split()) or None
+    return int(checkpoint_lines[1]), file_identity
+
+
+class Follower(object):
+    """
+    Reader for a CSV file at ``path`` that other processes append to, for
+    example a log. Iterating yields the rows of the records appended since
+    the last time, then waits ``poll_interval`` seconds for more records,
+    or stops if ``poll_interval`` is ``None``. Use `follow()` to create
+    one.
+
+    Only the bytes after `offset` are read and parsed. A trailing record
+    that does not end with a line break yet is held back until the rest of
+    it has been written. If the path refers to another file than before, for
+    example after rotating a log, or if the file shrinks, it is read again
+    from the start.
+
+    The `offset` after the last row yielded and the identity of the file
+    are stored in a checkpoint at ``checkpoint_path``, by default the
+    ``path`` with `CHECKPOINT_SUFFIX` appended, once all rows available have
+    been processed. When following the file again later, reading continues
+    from there. Use `save_checkpoint()` to store it more often. With
+    ``checkpoint_path=False``, no checkpoint is used.
+
+    The requirements concerning ``encoding`` and ``dialect`` are the same as
+    for `parallel_reader()`. Other ``keywords`` are passed to `reader()`.
+    """
+
+    def __init__(self, path, encoding='utf-8', dialect='excel', checkpoint_path=None, poll_interval=1.0,
+                 chunk_size=_DEFAULT_FOLLOW_CHUNK_SIZE, **keywords):
+        assert path is not None
+        assert chunk_size >= 1
+        encoding = _ascii_compatible_encoding(encoding)
+
+        self._path = path
+        self._encoding = encoding
+        self._keywords = _dialect_keywords(dialect, keywords)
+        self._quotechar = _record_quotechar(self._keywords)
+        if self._quotechar is not None:
+            self._quotechar = self._quotechar.encode(encoding)
+        self._chunk_size = chunk_size
+        if checkpoint_path is None:
+            checkpoint_path = path + CHECKPOINT_SUFFIX
+        self._checkpoint_path = checkpoint_path
+        self.poll_interval = poll_interval
+        #: Byte offset after the last row returned.
+        self.offset, self._file_identity = _read_checkpoint(checkpoint_path) if checkpoint_path else (0, None)
+
+    def _counted_lines(self, data, start_offset):
+        """
+        Lines of ``data``, which starts at ``start_offset`` of the file,
+        where `offset` is moved after each line once it has been read.
+        """
+        self.offset = start_offset
+        for line in iter(io.BytesIO(data).readline, b''):
+            self.offset += len(line)
+            yield line
+
+    def poll(self):
+        """
+        The rows of all complete records appended since `offset`, which is
+        moved after each row while iterating.
+        """
+        with io.open(self._path, 'rb') as binary_file:
+            file_identity = _file_identity(binary_file)
+            if self._file_identity not in (None, file_identity) or \
+                    os.fstat(binary_file.fileno()).st_size < self.offset:
+                # The file has been replaced or truncated.
+                self.offset = 0
+            self._file_identity = file_identity
+            if self.offset == 0:
+                self.offset = _utf8_bom_size(binary_file.read(len(codecs.BOM_UTF8)), self._encoding)
+            binary_file.seek(self.offset)
+            pending_data = b''
+            data = binary_file.read(self._chunk_size)
+            while data:
+                data = pending_data + data
+                complete_size = _complete_records_size(data, self._quotechar)
+                if complete_size > 0:
+                    lines = self._counted_lines(data[:complete_size], self.offset)
+                    for row in _binary_lines_reader(lines, self._encoding, **self._keywords):
+                        yield row
+                pending_data = data[complete_size:]
+                data = binary_file.read(self._chunk_size)
+
+    def save_checkpoint(self):
+        """
+        Store `offset` in the checkpoint so that following the file again
+        continues after the last row returned.
+        """
+        if self._checkpoint_path:
+            file_identity_text = '%d %d' % self._file_identity if self._file_identity is not None else ''
+            _replace_file(
+                self._checkpoint_path,
+                _CHECKPOINT_HEADER + ('\n%d\n%s\n' % (self.offset, file_identity_text)).encode('ascii'))
+
+    def __iter__(self):
+        while True:
+            has_rows = False
+            for row in self.poll():
+                has_rows = True
+                yield row
+            if has_rows:
+                self.save_checkpoint()
+            elif self.poll_interval is None:
+                break
+            else:
+                time.sleep(self.poll_interval)
+
+
+def follow(path, encoding='utf-8', dialect='excel', checkpoint_path=None, poll_interval=1.0, **keywords):
+    """
+    Same as `reader()` but for the file at ``path``, which continues to
+    yield rows as records are appended to the file, see `Follower`.
+    """
+    return Follower(path, encoding, dialect, checkpoint_path, poll_interval, **keywords)
+
+
+class MmapDictReader(DictReader):
+    """
+    Same as `DictReader` but for the file at ``path``, which is parsed from a
+    memory map, see `MmapReader`. The keyword argument ``encoding`` specifies
+    the encoding of the file.
+    """
+
+    def __init__(self, path, fieldnames=None, restkey=None, restval=None, dialect='excel', **kwds):
+        DictReader.__init__(self, path, fieldnames, restkey, restval, dialect, **kwds)
+
+    def _create_reader(self, path, dialect, *args, **kwds):
+        return MmapReader(path, dialect=dialect, **kwds)
+
+    @property
+    def offset(self):
+        return self.reader.offset
+
+    def seek(self, offset):
+        self.reader.seek(offset)
+
+    def close(self):
+        self.reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error_value, traceback):
+        self.close()
+
+
+#: Suffix `KeyIndex` appends to the path of a CSV file and the key for its
+#: index.
+KEY_INDEX_SUFFIX = '.csv342-keys'
+
+_KEY_INDEX_HEADER = b'csv342-key-index 1'
+
+#: Maximum number of keys `KeyIndex` sorts in memory at once.
+_KEY_INDEX_RUN_SIZE = 200000
+
+
+def _escaped_key(key):
+    """
+    ``key`` as UTF-8 bytes without tabs and line breaks, so it can be stored
+    in a line of a key index.
+    """
+    if not isinstance(key, type('')):
+        key = '%s' % key
+    return key.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r').encode('utf-8')
+
+
+def _written_key_index_run(escaped_keys_and_offsets):
+    """
+    Temporary file containing the sorted ``escaped_keys_and_offsets`` in the
+    same format as the lines of a key index.
+    """
+    escaped_keys_and_offsets.sort()
+    result = tempfile.TemporaryFile()
+    try:
+        for escaped_key, offset in escaped_keys_and_offsets:
+            result.write(escaped_key + ('\t%d\n' % offset).encode('ascii'))
+        result.seek(0)
+    except:
+        result.close()
+        raise
+    return result
+
+
+def _read_key_index_lines(key_index_file):
+    """
+    Pairs of ``(escaped_key, offset)`` from the lines of ``key_index_file``
+    starting at its current position.
+    """
+    for line in key_index_file:
+        escaped_key, offset = line.rstrip(b'\n').split(b'\t')
+        yield escaped_key, int(offset)
+
+
+class KeyIndex(object):
+    """
+    Lookup of rows by the value of the column ``key`` in the CSV file at
+    ``path`` without reading the whole file. The first time, the file is
+    read once to build an index with the byte offsets of each key, which is
+    stored sorted by key in ``index_path``, by default the ``path`` with
+    ``'.'``, the ``key`` and `KEY_INDEX_SUFFIX` appended. Later, the index is
+    reused unless the file has been modified since.
+
+    Building the index sorts the keys in runs stored in temporary files, and
+    lookups search the index using a memory map, so neither the index nor
+    the file have to fit in memory. The first row must contain the field
+    names, and the remaining arguments are the same as for `MmapDictReader`.
+    """
+
+    def __init__(self, path, key, encoding='utf-8', dialect='excel', index_path=None, **keywords):
+        assert path is not None
+        assert key is not None
+        if index_path is None:
+            index_path = '%s.%s%s' % (path, key, KEY_INDEX_SUFFIX)
+        self.key = key
+        self.index_path = index_path
+        self._index_file = None
+        self._mapping = None
+        self._dict_reader = MmapDictReader(path, dialect=dialect, encoding=encoding, **keywords)
+        try:
+            if self._dict_reader.fieldnames is None or key not in self._dict_reader.fieldnames:
+                raise ValueError('key is %r but must be one of: %s' % (key, self._dict_reader.fieldnames))
+            self._open_index(path)
+            if self._mapping is None:
+                self._build_index(path)
+                self._open_index(path)
+        except:
+            self.close()
+            raise
+
+    def _open_index(self, path):
+        try:
+            self._index_file = io.open(self.index_path, 'rb')
+        except (IOError, OSError):
+            return
+        header = self._index_file.readline().rstrip(b'\n')
+        if header != _KEY_INDEX_HEADER:
+            raise ValueError('file must be an index built by KeyIndex: %s' % self.index_path)
+        file_size, file_mtime = self._index_file.readline().decode('ascii').split()
+        if (int(file_size), file_mtime) == _file_signature(path):
+            self._data_start = self._index_file.tell()
+            self._mapping = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._index_file.close()
+            self._index_file = None
+
+    def _build_index(self, path):
+        """
+        Write the index for the file at ``path``. To limit the memory needed,
+        the keys are sorted in runs of `_KEY_INDEX_RUN_SIZE` keys, which are
+        stored in temporary files and merged.
+        """
+        file_size, file_mtime = _file_signature(path)
+        run_files = []
+        try:
+            escaped_keys_and_offsets = []
+            for row in self._dict_reader:
+                key = row[self.key]
+                if key is not None:
+                    escaped_keys_and_offsets.append((_escaped_key(key), self._dict_reader.offset))
+                    if len(escaped_keys_and_offsets) >= _KEY_INDEX_RUN_SIZE:
+                        run_files.append(_written_key_index_run(escaped_keys_and_offsets))
+                        escaped_keys_and_offsets = []
+            escaped_keys_and_offsets.sort()
+            if run_files:
+                escaped_keys_and_offsets = heapq.merge(
+                    escaped_keys_and_offsets, *[_read_key_index_lines(run_file) for run_file in run_files])
+            with io.open(self.index_path, 'wb') as index_file:
+                index_file.write(_KEY_INDEX_HEADER + b'\n')
+                index_file.write(('%d %s\n' % (file_size, file_mtime)).encode('ascii'))
+                for escaped_key, offset in escaped_keys_and_offsets:
+                    index_file.write(escaped_key + ('\t%d\n' % offset).encode('ascii'))
+        finally:
+            for run_file in run_files:
+                run_file.close()
+
+    def _offsets(self, key):
+        """
+        Byte offsets of the rows with ``key`` found with a binary search of
+        the sorted lines in the index.
+        """
+        escaped_key = _escaped_key(key)
+        mapping = self._mapping
+        low = self._data_start
+        high = mapping.size()
+        # Invariant: ``low`` is the start of a line and all lines before it
+        # have smaller keys.
+        while low < high:
+            middle = (low + high) // 2
+            line_start = mapping.rfind(b'\n', low, middle) + 1 or low
+            key_end = mapping.find(b'\t', line_start)
+            if mapping[line_start:key_end] < escaped_key:
+                low = mapping.find(b'\n', key_end) + 1
+            else:
+                high = line_start
+        result = []
+        mapping.seek(low)
+        for line in iter(mapping.readline, b''):
+            line_key, offset = line.rstrip(b'\n').split(b'\t')
+            if line_key != escaped_key:
+                break
+            result.append(int(offset))
+        return result
+
+    def lookup(self, key):
+        """
+        List of all rows as returned by `DictReader` where the column `key`
+        has the value ``key``, in the same order as in the file.
+        """
+        result = []
+        for offset in self._offsets(key):
+            self._dict_reader.seek(offset)
+            result.append(next(self._dict_reader))
+        return result
+
+    def lookup_many(self, keys):
+        """
+        Dictionary mapping each of the ``keys`` to a list of its rows, see
+        `lookup()`.
+        """
+        return dict((key, self.lookup(key)) for key in keys)
+
+    def close(self):
+        if self._mapping is not None:
+            self._mapping.close()
+        if self._index_file is not None:
+            self._index_file.close()
+        self._dict_reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error_value, traceback):
+        self.close()
+
+
+class PrefetchingReader(object):
+    """
+    A reader that reads rows from ``csv_reader``, for example one obtained
+    from `reader()` or `DictReader`, in a background thread, while the
+    caller processes the rows already read. This is useful if reading the
+    source is slow, for example when reading from a pipe or a network file
+    system. Up to ``batch_count`` batches of ``batch_row_count`` rows are read
+    ahead.
+
+    Errors while reading are raised by the next call to `next()` after the
+    rows read before them. `line_num` refers to the most recently returned
+    row. Once the remaining rows are not needed anymore, call `close()` to
+    stop reading ahead.
+    """
+
+    def __init__(self, csv_reader, batch_row_count=_DEFAULT_BATCH_ROW_COUNT, batch_count=2):
+        assert csv_reader is not None
+        assert batch_row_count >= 1
+        assert batch_count >= 1
+
+        self._csv_reader = csv_reader
+        self._batch_row_count = batch_row_count
+        self._queue = queue.Queue(batch_count)
+        self._line_nums_and_rows = []
+        self._row_index = 0
+        self._error = None
+        self._is_closed = False
+        self._has_more_rows = True
+        self.dialect = getattr(csv_reader, 'dialect', None)
+        self.line_num = getattr(csv_reader, 'line_num', 0)
+        self._thread = threading.Thread(target=self._prefetch_rows, name='csv342 prefetching reader')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._is_closed:
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _prefetch_rows(self):
+        line_nums_and_rows = []
+        try:
+            for row in self._csv_reader:
+                line_nums_and_rows.append((getattr(self._csv_reader, 'line_num', None), row))
+                if len(line_nums_and_rows) >= self._batch_row_count:
+                    if not self._put((line_nums_and_rows, None)):
+                        return
+                    line_nums_and_rows = []
+            if self._put((line_nums_and_rows, None)):
+                self._put(None)
+        except Exception as error:
+            self._put((line_nums_and_rows, error))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while self._row_index >= len(self._line_nums_and_rows):
+            if self._error is not None:
+                error = self._error
+                self._error = None
+                raise error
+            if not self._has_more_rows:
+                raise StopIteration()
+            line_nums_and_rows_and_error = self._queue.get()
+            if line_nums_and_rows_and_error is None:
+                self._has_more_rows = False
+            else:
+                self._line_nums_and_rows, self._error = line_nums_and_rows_and_error
+                self._row_index = 0
+                if self._error is not None:
+                    self._has_more_rows = False
+        self.line_num, result = self._line_nums_and_rows[self._row_index]
+        self._row_index += 1
+        return result
+
+    def next(self):
+        return self.__next__()
+
+    def close(self):
+        """
+        Stop reading ahead. The background thread stops once it finished
+        reading the current row.
+        """
+        self._is_closed = True
+        self._has_more_rows = False
+        self._line_nums_and_rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error_value, traceback):
+        self.close()
+
+
+class WriteBehindWriter(object):
+    """
+    A writer that passes rows to ``csv_writer``, for example one obtained
+    from `writer()` or `DictWriter`, in a background thread, while the caller
+    continues preparing further rows. This is useful if writing the target
+    is slow, for example when writing to a pipe or a network file system.
+    Rows are collected in batches of ``batch_row_count`` rows, and up to
+    ``batch_count`` batches wait to be written.
+
+    Errors while writing are raised by the next call to `writerow()`,
+    `writerows()`, `flush()` or `close()`; rows passed after the error are
+    not written. Call `close()` before closing the target stream to write all
+    remaining rows.
+    """
+
+    def __init__(self, csv_writer, batch_row_count=_DEFAULT_BATCH_ROW_COUNT, batch_count=2):
+        assert csv_writer is not None
+        assert batch_row_count >= 1
+        assert batch_count >= 1
+
+        self._csv_writer = csv_writer
+        self._batch_row_count = batch_row_count
+        self._queue = queue.Queue(batch_count)
+        self._rows = []
+        self._error = None
+        self._is_closed = False
+        self._thread = threading.Thread(target=self._write_rows_behind, name='csv342 write-behind writer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _write_rows_behind(self):
+        rows = self._queue.get()
+        while rows is not None:
+            try:
+                if self._error is None:
+                    self._csv_writer.writerows(rows)
+            except Exception as error:
+                self._error = error
+            finally:
+                self._queue.task_done()
+            rows = self._queue.get()
+        self._queue.task_done()
+
+    def _raise_possible_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _queue_rows(self):
+        if self._rows:
+            self._queue.put(self._rows)
+            self._rows = []
+
+    def writerow(self, row):
+        assert not self._is_closed, 'writer must not be closed'
+        self._raise_possible_error()
+        # Copy the row in case the caller reuses it for the next row.
+        self._rows.append(dict(row) if isinstance(row, Mapping) else list(row))
+        if len(self._rows) >= self._batch_row_count:
+            self._queue_rows()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def writeheader(self):
+        """
+        Same as `DictWriter.writeheader()` for a ``csv_writer`` that is a
+        `DictWriter`.
+        """
+        self.flush()
+        self._csv_writer.writeheader()
+
+    def flush(self):
+        """
+        Wait until all rows passed so far have been written.
+        """
+        self._queue_rows()
+        self._queue.join()
+        self._raise_possible_error()
+
+    def close(self):
+        """
+        Write all remaining rows and stop the background thread.
+        """
+        if not self._is_closed:
+            self._is_closed = True
+            self._queue_rows()
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_possible_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error_value, traceback):
+        self.close()
+
+
+#: Default number of bytes `detect()` examines.
+_DEFAULT_DETECT_SAMPLE_SIZE = 64 * 1024
+
+#: Number of files `detect()` remembers the results for.
+_DETECT_CACHE_SIZE = 128
+
+#: Number of results a `detect()` cache file keeps at most.
+_DETECT_CACHE_FILE_SIZE = 1024
+
+_DETECT_DELIMITERS = ',;\t|:'
+
+
+class _LruCache(object):
+    """
+    A dictionary like cache that forgets the least recently used items when
+    it contains more than ``max_size`` items. It can be used by multiple
+    threads.
+    """
+
+    def __init__(self, max_size):
+        assert max_size >= 1
+        self._max_size = max_size
+        self._key_to_tick_and_value = {}
+        self._ticks = itertools.count()
+        self._lock = _allocate_lock()
+
+    def get(self, key):
+        with self._lock:
+            tick_and_value = self._key_to_tick_and_value.get(key)
+            if tick_and_value is None:
+                return None
+            self._key_to_tick_and_value[key] = (next(self._ticks), tick_and_value[1])
+            return tick_and_value[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._key_to_tick_and_value[key] = (next(self._ticks), value)
+            if len(self._key_to_tick_and_value) > self._max_size:
+                least_recently_used_key = min(
+                    self._key_to_tick_and_value, key=lambda some_key: self._key_to_tick_and_value[some_key][0])
+                del self._key_to_tick_and_value[least_recently_used_key]
+
+    def clear(self):
+        with self._lock:
+            self._key_to_tick_and_value.clear()
+
+
+_detected_dialects = _LruCache(_DETECT_CACHE_SIZE)
+
+
+def _sample_text(sample, encoding, is_complete):
+    """
+    Text of the ``sample``, which are bytes in ``encoding`` unless
+    ``encoding`` is ``None``, where a character or line that might have been
+    cut off at the end of an incomplete sample is removed.
+    """
+    if encoding is None:
+        result = sample
+    else:
+        result = codecs.getincrementaldecoder(encoding)().decode(sample, final=is_complete)
+    if not is_complete:
+        last_newline_index = max(result.rfind('\n'), result.rfind('\r'))
+        if last_newline_index != -1:
+            result = result[:last_newline_index + 1]
+    return result
+
+
+def _is_number(text):
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+
+def _detected_has_header(rows):
+    """
+    Whether the first of ``rows`` seems to contain field names, which is the
+    case if its values differ in type or length from the columns below.
+    """
+    if len(rows) < 2:
+        return False
+    votes = 0
+    for column_index, first_value in enumerate(rows[0]):
+        values = [row[column_index] for row in rows[1:] if len(row) > column_index and row[column_index]]
+        if not values or not first_value:
+            continue
+        if all(_is_number(value) for value in values):
+            votes += -1 if _is_number(first_value) else 1
+        else:
+            value_lengths = set(len(value) for value in values)
+            if len(value_lengths) == 1:
+                votes += -1 if len(first_value) in value_lengths else 1
+    return votes > 0
+
+
+def _has_quoted_field(sample, quotechar, delimiters):
+    """
+    True if ``sample`` contains a field quoted with ``quotechar``, which
+    starts at the beginning of a line or after one of the ``delimiters`` and
+    ends at the end of a line or before one of them.
+    """
+    delimiters_pattern = '[%s]' % re.escape(delimiters)
+    quoted_field_pattern = r'(?:^|%s) *%s(?:[^%s]|%s%s)*%s *(?:%s|\r?$)' % (
+        (delimiters_pattern,) + (re.escape(quotechar),) * 5 + (delimiters_pattern,))
+    return re.search(quoted_field_pattern, sample, re.MULTILINE) is not None
+
+
+def _detected_dialect_attributes(sample, delimiters):
+    """
+    Dictionary with the attributes of the dialect ``sample`` seems to use,
+    including ``has_header``.
+    """
+    quotechar = '"'
+    if not _has_quoted_field(sample, '"', delimiters) and _has_quoted_field(sample, "'", delimiters):
+        quotechar = "'"
+    best_score = None
+    best_delimiter = delimiters[0]
+    best_rows = []
+    for delimiter in delimiters:
+        if delimiter not in sample:
+            continue
+        try:
+            rows = [row for row in reader(io.StringIO(sample), delimiter=delimiter, quotechar=quotechar) if row]
+        except Error:
+            continue
+        column_counts = [len(row) for row in rows]
+        typical_column_count = max(set(column_counts), key=column_counts.count)
+        if typical_column_count >= 2:
+            # Prefer delimiters resulting in the same number of columns for
+            # most rows, then in more columns.
+            score = (column_counts.count(typical_column_count), typical_column_count)
+            if best_score is None or score > best_score:
+                best_score = score
+                best_delimiter = delimiter
+                best_rows = rows
+    delimiter_count = sample.count(best_delimiter)
+    skipinitialspace = delimiter_count > 0 and sample.count(best_delimiter + ' ') > delimiter_count // 2
+    if skipinitialspace:
+        best_rows = [[value.lstrip(' ') for value in row] for row in best_rows]
+    return {
+        'delimiter': best_delimiter,
+        'quotechar': quotechar,
+        'doublequote': True,
+        'skipinitialspace': skipinitialspace,
+        'lineterminator': '\r\n' if '\r\n' in sample or '\n' not in sample else '\n',
+        'quoting': QUOTE_MINIMAL,
+        'has_header': _detected_has_header(best_rows),
+    }
+
+
+def _detected_dialect(attributes):
+    class detected(Dialect):
+        pass
+
+    for name, value in attributes.items():
+        # Under Python 2, formatting parameters must be of type `str`.
+        setattr(detected, str(name), str(value) if isinstance(value, type('')) else value)
+    return detected
+
+
+def _read_detect_cache_file(cache_path):
+    """
+    Ordered dictionary with the results stored in the `detect()` cache file
+    at ``cache_path``, which is empty if the file is missing or broken.
+    """
+    try:
+        with io.open(cache_path, 'r', encoding='utf-8') as cache_file:
+            return json.load(cache_file, object_pairs_hook=collections.OrderedDict)
+    except (IOError, OSError, ValueError):
+        return collections.OrderedDict()
+
+
+def _write_detect_cache_file(cache_path, path, cache_key, attributes):
+    """
+    Add ``attributes`` for ``cache_key`` to the `detect()` cache file at
+    ``cache_path``, removing results for other versions of the file at
+    ``path`` and the oldest results beyond `_DETECT_CACHE_FILE_SIZE`.
+    """
+    path_prefix = path + '|'
+
+    def is_for_path(key):
+        return key.startswith(path_prefix) and key[len(path_prefix):].split('|', 1)[0].isdigit()
+
+    key_to_attributes = collections.OrderedDict(
+        (key, key_attributes) for key, key_attributes in _read_detect_cache_file(cache_path).items()
+        if not is_for_path(key))
+    key_to_attributes[cache_key] = attributes
+    while len(key_to_attributes) > _DETECT_CACHE_FILE_SIZE:
+        key_to_attributes.popitem(last=False)
+    _replace_file(cache_path, json.dumps(key_to_attributes).encode('utf-8'))
+
+
+def detect(path_or_stream, encoding='utf-8', sample_size=_DEFAULT_DETECT_SAMPLE_SIZE, delimiters=_DETECT_DELIMITERS,
+           cache_path=None):
+    """
+    Dialect of the CSV file at ``path_or_stream`` as detected from its first
+    ``sample_size`` bytes, which can be passed to `reader()` and
+    `DictReader`. Additionally, its ``has_header`` attribute tells whether
+    the first row seems to contain field names. Unlike `Sniffer`, the sample
+    is parsed with each of the ``delimiters`` instead of examined with
+    regular expressions.
+
+    For paths, the result is remembered for the most recently detected files
+    until they are modified. If ``cache_path`` is specified, the results are
+    also stored in this JSON file and reused by other processes. It keeps
+    the results for the current version of up to `_DETECT_CACHE_FILE_SIZE`
+    files.
+
+    For streams, the text is read from the current position, which is
+    restored afterwards if the stream supports it. Binary streams must use
+    ``encoding``.
+    """
+    assert path_or_stream is not None
+    assert sample_size >= 1
+    assert delimiters
+
+    cache_key = None
+    if isinstance(path_or_stream, (type(''), type(b''))):
+        path = os.path.abspath(path_or_stream)
+        file_size, file_mtime = _file_signature(path)
+        cache_key = '%s|%d|%s|%d|%s|%s' % (path, file_size, file_mtime, sample_size, encoding, delimiters)
+        result = _detected_dialects.get(cache_key)
+        if result is None and cache_path is not None:
+            result = _read_detect_cache_file(cache_path).get(cache_key)
+        if result is not None:
+            _detected_dialects.put(cache_key, result)
+            return _detected_dialect(result)
+        with io.open(path, 'rb') as binary_file:
+            data = binary_file.read(sample_size)
+        sample = _sample_text(data, encoding, len(data) < sample_size)
+    else:
+        stream = path_or_stream
+        is_seekable = stream.seekable() if hasattr(stream, 'seekable') else hasattr(stream, 'seek')
+        start_position = stream.tell() if is_seekable else None
+        data = stream.read(sample_size)
+        sample = _sample_text(data, encoding if _is_binary_stream(stream) else None, len(data) < sample_size)
+        if start_position is not None:
+            stream.seek(start_position)
+
+    result = _detected_dialect_attributes(sample, delimiters)
+    if cache_key is not None:
+        _detected_dialects.put(cache_key, result)
+        if cache_path is not None:
+            _write_detect_cache_file(cache_path, path, cache_key, result)
+    return _detected_dialect(result)
+
+
+def _imported_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('numpy must be installed to read columns as arrays')
+    return numpy
+
+
+def _numpy_array(numpy, values, dtype):
+    if dtype is None:
+        return numpy.array(values)
+    dtype = numpy.dtype(dtype)
+    if dtype.kind in 'fc' and '' in values:
+        values = ['nan' if value == '' else value for value in values]
+    return numpy.array(values, dtype=dtype)
+
+
+def _prepared_column_reader(source_stream, columns, dtypes, header, dialect, keywords):
+    """
+    Tuple ``(keys, csv_reader, select_columns, column_dtypes)`` for
+    `iter_column_batches()`, where ``keys`` and ``select_columns`` are
+    ``None`` if they can only be determined from the first row.
+    """
+    csv_reader = reader(source_stream, dialect, **keywords)
+    if header:
+        try:
+            fieldnames = next(csv_reader)
+        except StopIteration:
+            fieldnames = []
+        if columns is None:
+            columns = fieldnames
+        column_indexes = []
+        for column in columns:
+            if isinstance(column, numbers.Integral):
+                if not 0 <= column < len(fieldnames):
+                    raise ValueError(
+                        'column index is %d but must be between 0 and %d' % (column, len(fieldnames) - 1))
+                column_indexes.append(column)
+            else:
+                try:
+                    column_indexes.append(fieldnames.index(column))
+                except ValueError:
+                    raise ValueError('column is %r but must be one of: %s' % (column, fieldnames))
+        keys = [fieldnames[column_index] for column_index in column_indexes]
+    elif columns is None:
+        return None, csv_reader, None, None
+    else:
+        column_indexes = list(columns)
+        keys = column_indexes
+    column_dtypes = [(dtypes or {}).get(key) for key in keys]
+    if not column_indexes:
+        return keys, csv_reader, None, column_dtypes
+    column_indexes = _checked_column_indexes(column_indexes)
+    if hasattr(csv_reader, '_select_columns'):
+        # Let the reader skip the other columns as early as possible.
+        csv_reader._select_columns(column_indexes, '')
+        select_columns = None
+    else:
+        select_columns = _column_selector(column_indexes, '')
+    return keys, csv_reader, select_columns, column_dtypes
+
+
+def iter_column_batches(source_stream, columns=None, dtypes=None, batch_row_count=_DEFAULT_BATCH_ROW_COUNT,
+                        header=True, dialect='excel', **keywords):
+    """
+    Dictionaries mapping each of the ``columns`` to a NumPy array with its
+    values from the next up to ``batch_row_count`` rows read from
+    ``source_stream``, until all rows have been read. This requires NumPy.
+
+    If ``header`` is ``True``, the first row contains the column names and
+    ``columns`` can be names or column indexes; otherwise, ``columns`` must
+    be column indexes, which also are the keys of the result. By default,
+    all columns are read. Empty rows are skipped and missing items are
+    empty.
+
+    ``dtypes`` maps columns to NumPy data types, for example ``float`` or
+    ``'datetime64[D]'``, which NumPy converts the text to. Empty items in
+    columns with a floating point type are NaN. Without a dtype, arrays
+    contain text.
+    """
+    numpy = _imported_numpy()
+    keys, csv_reader, select_columns, column_dtypes = _prepared_column_reader(
+        source_stream, columns, dtypes, header, dialect, keywords)
+    for key_to_array in _column_batches(
+            numpy, keys, csv_reader, select_columns, column_dtypes, dtypes, batch_row_count):
+        yield key_to_array
+
+
+def _column_batches(numpy, keys, csv_reader, select_columns, column_dtypes, dtypes, batch_row_count):
+    """
+    The batches for `iter_column_batches()` using the result of
+    `_prepared_column_reader()`.
+    """
+    if keys is not None and not keys:
+        return
+    for rows in iter_batches(csv_reader, batch_row_count):
+        if [] in rows:
+            rows = [row for row in rows if row]
+            if not rows:
+                continue
+        if keys is None:
+            # Without header and columns, use all columns of the first row.
+            keys = list(range(len(rows[0])))
+            column_dtypes = [(dtypes or {}).get(key) for key in keys]
+            select_columns = _column_selector(keys, '')
+        if select_columns is not None:
+            rows = [select_columns(row) for row in rows]
+        yield dict(
+            (key, _numpy_array(numpy, values, dtype))
+            for key, values, dtype in zip(keys, zip(*rows), column_dtypes))
+
+
+def read_columns(source_stream, columns=None, dtypes=None, header=True, dialect='excel', **keywords):
+    """
+    Dictionary mapping each of the ``columns`` to a NumPy array with all its
+    values read from ``source_stream``. For details, see
+    `iter_column_batches()`.
+    """
+    numpy = _imported_numpy()
+    keys, csv_reader, select_columns, column_dtypes = _prepared_column_reader(
+        source_stream, columns, dtypes, header, dialect, keywords)
+    key_to_arrays = {}
+    for key_to_array in _column_batches(
+            numpy, keys, csv_reader, select_columns, column_dtypes, dtypes, _DEFAULT_BATCH_ROW_COUNT * 10):
+        for key, array in key_to_array.items():
+            key_to_arrays.setdefault(key, []).append(array)
+    if not key_to_arrays and keys is not None:
+        # Without any rows, the columns are still known but empty.
+        return dict(
+            (key, _numpy_array(numpy, [], dtype if dtype is not None else type('')))
+            for key, dtype in zip(keys, column_dtypes))
+    return dict((key, numpy.concatenate(arrays)) for key, arrays in key_to_arrays.items())
+
+
+def _utf8_text_test(text_test):
+    """
+    Function that decodes a UTF-8 encoded item and passes it to
+    ``text_test``.
+    """
+    return lambda item: text_test(item.decode('utf-8'))
+
+
+class _Condition(object):
+    """
+    A condition for the value in ``column`` that can be tested without
+    decoding the value where possible.
+    """
+
+    def __init__(self, column, text_test, utf8_test=None):
+        self.column = column
+        self.text_test = text_test
+        self.utf8_test = utf8_test or _utf8_text_test(text_test)
+
+    def accepts(self, row):
+        try:
+            value = row[self.column]
+        except (IndexError, KeyError):
+            return False
+        return value is not None and self.text_test(value)
+
+
+def _checked_text(name, value):
+    """
+    ``value`` after checking that it is text, where ``name`` describes it
+    for the error message.
+    """
+    if not isinstance(value, (type(''), str)):
+        raise TypeError('%s is %r but must be text' % (name, value))
+    return value
+
+
+def _range_test(minimum, maximum, convert):
+    def is_in_range(text):
+        try:
+            value = convert(text) if convert is not None else text
+        except ValueError:
+            return False
+        return (minimum is None or value >= minimum) and (maximum is None or value <= maximum)
+
+    return is_in_range
+
+
+def _indexed_rows_predicate(column_indexes_and_tests):
+    """
+    Function that tells whether all the tests accept the items at their
+    column index in a list.
+    """
+    def accepts_row(row):
+        row_length = len(row)
+        for column_index, test in column_indexes_and_tests:
+            if column_index >= row_length or not test(row[column_index]):
+                return False
+        return True
+
+    return accepts_row
+
+
+class Pipeline(object):
+    """
+    Stages to filter and transform the rows of a CSV source, which are
+    processed one row at a time once the pipeline is iterated or
+    `to_writer()` is called. Use `pipeline()` to create one.
+
+    Rows are dictionaries if the source has a header, and lists otherwise.
+    In the latter case, columns are specified by index instead of by name.
+    Conditions added with `where_equal()`, `where_prefix()` and
+    `where_range()` before any `map()` are checked before a row is turned
+    into a dictionary, and under Python 2 even before it is decoded.
+    """
+
+    def __init__(self, source_stream, header=True, dialect='excel', **keywords):
+        assert source_stream is not None
+        self._source_stream = source_stream
+        self._header = header
+        self._dialect = dialect
+        self._keywords = keywords
+        #: Pairs of ``(kind, argument)`` for each stage.
+        self._stages = []
+        self.fieldnames = None
+
+    def _add(self, kind, argument):
+        self._stages.append((kind, argument))
+        return self
+
+    def where(self, predicate):
+        """
+        Only keep rows for which ``predicate(row)`` is true.
+        """
+        return self._add('where', predicate)
+
+    def where_equal(self, column, value):
+        """
+        Only keep rows where ``column`` has the text ``value``.
+        """
+        utf8_value = _checked_text('value', value).encode('utf-8')
+        return self._add('condition', _Condition(column, lambda text: text == value, lambda item: item == utf8_value))
+
+    def where_prefix(self, column, prefix):
+        """
+        Only keep rows where the text in ``column`` starts with ``prefix``.
+        """
+        utf8_prefix = _checked_text('prefix', prefix).encode('utf-8')
+        return self._add('condition', _Condition(
+            column, lambda text: text.startswith(prefix), lambda item: item.startswith(utf8_prefix)))
+
+    def where_range(self, column, minimum=None, maximum=None, convert=None):
+        """
+        Only keep rows where the value in ``column`` is between ``minimum``
+        and ``maximum`` (both inclusive and optional). If ``convert`` is
+        specified, the text is converted with it before comparing, and
+        texts it cannot convert are not in range.
+        """
+        return self._add('condition', _Condition(column, _range_test(minimum, maximum, convert)))
+
+    def select(self, *columns):
+        """
+        Only keep ``columns`` in this order.
+        """
+        assert columns
+        return self._add('select', columns)
+
+    def map(self, function):
+        """
+        Replace each row by ``function(row)``.
+        """
+        return self._add('map', function)
+
+    def _column_index(self, column, fieldnames):
+        if fieldnames is None:
+            if not isinstance(column, numbers.Integral) or column < 0:
+                raise ValueError('column is %r but must be an integer number of at least 0' % (column,))
+            return column
+        try:
+            return list(fieldnames).index(column)
+        except ValueError:
+            raise ValueError('column is %r but must be one of: %s' % (column, fieldnames))
+
+    def _source_column_index(self, column, fieldnames, source_column_indexes):
+        """
+        Index of the source column that ``column`` refers to after selects
+        resulting in ``fieldnames`` and ``source_column_indexes``, or
+        ``None`` if it does not refer to a column of the source.
+        """
+        if source_column_indexes is not None and fieldnames is not None and column not in fieldnames:
+            return None
+        column_index = self._column_index(column, fieldnames)
+        if source_column_indexes is None:
+            return column_index
+        return source_column_indexes[column_index] if column_index < len(source_column_indexes) else None
+
+    def _fieldnames_and_rows(self):
+        csv_reader = reader(self._source_stream, self._dialect, **self._keywords)
+        source_fieldnames = None
+        if self._header:
+            source_fieldnames = next(csv_reader, [])
+        fieldnames = source_fieldnames
+
+        # Push down conditions until the first map because until then the
+        # columns of rows can be traced back to the columns of the source.
+        pushed_down_conditions = []
+        remaining_stages = []
+        # Source column index of each column after the selects so far, or
+        # ``None`` before the first select.
+        source_column_indexes = None
+        stage_fieldnames = source_fieldnames
+        for stage_index, (kind, argument) in enumerate(self._stages):
+            if kind == 'map':
+                remaining_stages.extend(self._stages[stage_index:])
+                break
+            if kind == 'condition':
+                source_column_index = self._source_column_index(
+                    argument.column, stage_fieldnames, source_column_indexes)
+                if source_column_index is not None:
+                    pushed_down_conditions.append((source_column_index, argument))
+                    continue
+            elif kind == 'select':
+                column_indexes = [self._column_index(column, stage_fieldnames) for column in argument]
+                if source_column_indexes is not None:
+                    column_indexes = [
+                        source_column_indexes[column_index] if column_index < len(source_column_indexes) else None
+                        for column_index in column_indexes]
+                source_column_indexes = column_indexes
+                if stage_fieldnames is not None:
+                    stage_fieldnames = list(argument)
+            remaining_stages.append((kind, argument))
+        rows = csv_reader
+        if pushed_down_conditions:
+            if hasattr(csv_reader, '_filter_raw_rows'):
+                csv_reader._filter_raw_rows(_indexed_rows_predicate([
+                    (source_column_index, condition.utf8_test)
+                    for source_column_index, condition in pushed_down_conditions]))
+            else:
+                rows = Pipeline._staged_rows(rows, 'where', _indexed_rows_predicate([
+                    (source_column_index, condition.text_test)
+                    for source_column_index, condition in pushed_down_conditions]))
+
+        # Select the columns of leading selects before creating dictionaries.
+        is_first_select = True
+        while remaining_stages and remaining_stages[0][0] == 'select':
+            columns = remaining_stages.pop(0)[1]
+            column_indexes = _checked_column_indexes([self._column_index(column, fieldnames) for column in columns])
+            if is_first_select and hasattr(csv_reader, '_select_columns'):
+                # Only decode the selected columns.
+                csv_reader._select_columns(column_indexes, None)
+            else:
+                rows = Pipeline._selected_rows(rows, _column_selector(column_indexes, None))
+            is_first_select = False
+            if fieldnames is not None:
+                fieldnames = list(columns)
+
+        if fieldnames is not None:
+            rows = self._dict_rows(rows, fieldnames)
+        for kind, argument in remaining_stages:
+            rows = self._staged_rows(rows, kind, argument)
+            if kind == 'select' and fieldnames is not None:
+                fieldnames = list(argument)
+        self.fieldnames = fieldnames
+        return fieldnames, rows
+
+    @staticmethod
+    def _selected_rows(rows, select_columns):
+        for row in rows:
+            yield select_columns(row)
+
+    @staticmethod
+    def _dict_rows(rows, fieldnames):
+        fieldname_count = len(fieldnames)
+        for row in rows:
+            if row:
+                if len(row) < fieldname_count:
+                    row = row + [None] * (fieldname_count - len(row))
+                yield dict(zip(fieldnames, row))
+
+    @staticmethod
+    def _staged_rows(rows, kind, argument):
+        if kind == 'where':
+            return (row for row in rows if argument(row))
+        if kind == 'condition':
+            return (row for row in rows if argument.accepts(row))
+        if kind == 'map':
+            return (argument(row) for row in rows)
+        assert kind == 'select', 'kind=%r' % kind
+        return ([row[column] for column in argument] if isinstance(row, list) else
+                dict((column, row.get(column)) for column in argument) for row in rows)
+
+    def __iter__(self):
+        return iter(self._fieldnames_and_rows()[1])
+
+    def to_writer(self, target_stream, dialect='excel', fieldnames=None, **keywords):
+        """
+        Write the resulting rows to ``target_stream`` and return their
+        number. If the source has a header, the rows are written with
+        `DictWriter` using ``fieldnames``, by default the ones of the
+        source respectively of the last `select()`.
+        """
+        source_fieldnames, rows = self._fieldnames_and_rows()
+        result = [0]
+
+        def counted_rows():
+            for row in rows:
+                result[0] += 1
+                yield row
+
+        if source_fieldnames is None and fieldnames is None:
+            writer(target_stream, dialect, **keywords).writerows(counted_rows())
+        else:
+            dict_writer = DictWriter(target_stream, fieldnames or source_fieldnames, dialect=dialect, **keywords)
+            dict_writer.writeheader()
+            dict_writer.writerows(counted_rows())
+        return result[0]
+
+
+def pipeline(source_stream, header=True, dialect='excel', **keywords):
+    """
+    A `Pipeline` for the rows read from ``source_stream`` using `reader()`
+    with ``dialect`` and ``keywords``. If ``header`` is ``True``, the first
+    row contains the field names.
+
+    >>> import io
+    >>> source = io.StringIO('name,size\\na,1\\nb,20\\nab,300\\n')
+    >>> target = io.StringIO(newline='')
+    >>> pipeline(source).where_prefix('name', 'a').where_range('size', 100, convert=int).select('size').to_writer(target)
+    1
+    """
+    return Pipeline(source_stream, header, dialect, **keywords)
+
+
+#: Names ``from csv342_extras import *`` imports, which csv342 provides as its
+#: attributes.
+__all__ = list(_EXTRAS_NAMES)
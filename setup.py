@@ -52,6 +52,7 @@ Tag a release::
 from distutils.core import setup
 import io
 import os
+import sys
 import csv342
 
 _project_folder = os.path.dirname(__file__)
@@ -62,7 +63,8 @@ with io.open(_readme_path, 'r', encoding='utf-8') as readme_file:
 setup(
     name="csv342",
     version=csv342.__version__,
-    py_modules=["csv342"],
+    # csv342_aio uses syntax that requires Python 3.6 or later.
+    py_modules=["csv342", "csv342_extras"] + (["csv342_aio"] if sys.version_info >= (3, 6) else []),
     description="Python 3 like CSV module for Python 2",
     keywords="csv",
     author="Thomas Aglassinger",
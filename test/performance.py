@@ -1,44 +1,344 @@
 """
-Performance test for csv342.
+Benchmarks for csv342.
+
+Each benchmark reads or writes a temporary CSV file with one of `reader`,
+`writer`, `DictReader` and `DictWriter`, where the rows differ in the
+number of columns, the length of fields, the ratio of fields that need
+quotes and the ratio of fields with non ASCII characters. Starting with a
+baseline scenario, each of these and the size of the file are varied one
+at a time.
+
+For example, to compare the performance of a change to a baseline run:
+
+    python test/performance.py --json before.json
+    # ...change something...
+    python test/performance.py --json after.json --compare before.json
+
+To compare two existing runs, for example Python 2 and 3:
+
+    python test/performance.py --compare python2.json python3.json
 """
+from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import argparse
 import io
+import json
 import os
-import timeit
+import platform
+import random
+import subprocess
+import sys
 import tempfile
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
 
 import csv342 as csv
 
-_TEST_ROW_COUNT = 3000
-_TEST_CSV_PATH = os.path.join(tempfile.gettempdir(), 'csv342_performance.csv')
-_TEST_ROW = [
-    'test',
-    '"' * 10,
-    1,
-    None,
-    'a' * 200
-] * 20
+_MEGABYTE = 1024 * 1024
+
+#: Scenario the other scenarios vary one parameter of.
+_BASELINE_SCENARIO = {
+    'columns': 10,
+    'field_length': 10,
+    'non_ascii_ratio': 0.0,
+    'quote_ratio': 0.0,
+    'size_mb': 1.0,
+}
+
+#: Parameter and value for each scenario that differs from the baseline.
+_SCENARIO_VARIATIONS = (
+    ('columns', 100),
+    ('field_length', 200),
+    ('non_ascii_ratio', 0.5),
+    ('quote_ratio', 0.5),
+    ('size_mb', 10.0),
+)
+
+OPERATIONS = ('reader', 'writer', 'DictReader', 'DictWriter')
+
+#: Number of different rows that are repeated to fill a file.
+_DISTINCT_ROW_COUNT = 100
+
+_ASCII_CHARACTERS = 'abcdefghijklmnopqrstuvwxyz0123456789'
+_NON_ASCII_CHARACTERS = '\u00e4\u00f6\u00fc\u00df\u20ac\u4e2d'
+_QUOTE_REQUIRING_TEXTS = ('"', ',', '\r\n')
+
+
+def scenarios(scale=1.0):
+    """
+    The baseline scenario followed by one scenario for each of the
+    `_SCENARIO_VARIATIONS`, where the size is multiplied by ``scale``.
+    """
+    baseline = dict(_BASELINE_SCENARIO)
+    baseline['size_mb'] *= scale
+    yield baseline
+    for name, value in _SCENARIO_VARIATIONS:
+        result = dict(baseline)
+        result[name] = value * scale if name == 'size_mb' else value
+        yield result
+
+
+def scenario_name(scenario):
+    return ','.join('%s=%s' % (name, scenario[name]) for name in sorted(scenario))
+
+
+def _random_field(random_generator, scenario):
+    if random_generator.random() < scenario['non_ascii_ratio']:
+        characters = _ASCII_CHARACTERS + _NON_ASCII_CHARACTERS
+    else:
+        characters = _ASCII_CHARACTERS
+    result = ''.join(random_generator.choice(characters) for _ in range(scenario['field_length']))
+    if random_generator.random() < scenario['quote_ratio']:
+        middle = len(result) // 2
+        result = result[:middle] + random_generator.choice(_QUOTE_REQUIRING_TEXTS) + result[middle + 1:]
+    return result
+
+
+def _rows(scenario):
+    """
+    Rows for ``scenario``, which add up to a file of about ``size_mb``
+    megabytes.
+    """
+    random_generator = random.Random(42)
+    distinct_rows = [
+        [_random_field(random_generator, scenario) for _ in range(scenario['columns'])]
+        for _ in range(_DISTINCT_ROW_COUNT)
+    ]
+    row_size = scenario['columns'] * (scenario['field_length'] + 1)
+    row_count = max(1, int(scenario['size_mb'] * _MEGABYTE / row_size))
+    return [distinct_rows[row_index % _DISTINCT_ROW_COUNT] for row_index in range(row_count)]
+
+
+def _fieldnames(scenario):
+    return ['column_%d' % column_index for column_index in range(scenario['columns'])]
+
+
+def _write_rows(csv_path, rows, fieldnames):
+    with io.open(csv_path, 'w', encoding='utf-8', newline='') as csv_file:
+        csv_writer = csv.writer(csv_file)
+        csv_writer.writerow(fieldnames)
+        csv_writer.writerows(rows)
+
+
+def _write_dicts(csv_path, row_dicts, fieldnames):
+    with io.open(csv_path, 'w', encoding='utf-8', newline='') as csv_file:
+        csv_writer = csv.DictWriter(csv_file, fieldnames)
+        csv_writer.writeheader()
+        csv_writer.writerows(row_dicts)
+
+
+def _read_rows(csv_path):
+    with io.open(csv_path, encoding='utf-8', newline='') as csv_file:
+        for _ in csv.reader(csv_file):
+            pass
 
 
-def _read_and_write_csv():
-    has_temp_file = False
+def _read_dicts(csv_path):
+    with io.open(csv_path, encoding='utf-8', newline='') as csv_file:
+        for _ in csv.DictReader(csv_file):
+            pass
+
+
+def _operation_function(operation, csv_path, scenario):
+    """
+    Tuple ``(function, row_count)`` where ``function`` has no arguments and
+    performs ``operation`` for ``scenario`` with the file at ``csv_path``.
+    """
+    fieldnames = _fieldnames(scenario)
+    rows = _rows(scenario)
+    if operation == 'writer':
+        return lambda: _write_rows(csv_path, rows, fieldnames), len(rows)
+    if operation == 'DictWriter':
+        row_dicts = [dict(zip(fieldnames, row)) for row in rows]
+        return lambda: _write_dicts(csv_path, row_dicts, fieldnames), len(rows)
+    _write_rows(csv_path, rows, fieldnames)
+    if operation == 'reader':
+        return lambda: _read_rows(csv_path), len(rows)
+    assert operation == 'DictReader', 'operation=%r' % operation
+    return lambda: _read_dicts(csv_path), len(rows)
+
+
+def _peak_memory(function):
+    """
+    Peak number of bytes allocated while calling ``function``, or ``None``
+    under Python 2, which cannot trace memory allocations.
+    """
+    if tracemalloc is None:
+        return None
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(operation, scenario, repeat=3):
+    """
+    Dictionary with the results of the fastest of ``repeat`` runs of
+    ``operation`` for ``scenario``.
+    """
+    csv_file_descriptor, csv_path = tempfile.mkstemp(prefix='csv342_performance_', suffix='.csv')
+    os.close(csv_file_descriptor)
     try:
-        with io.open(_TEST_CSV_PATH, 'w', encoding='utf-8', newline='') as csv_file:
-            has_temp_file = True
-            csv_writer = csv.writer(csv_file)
-            for _ in range(_TEST_ROW_COUNT):
-                csv_writer.writerow(_TEST_ROW)
-        with io.open(_TEST_CSV_PATH, 'r', encoding='utf-8', newline='') as csv_file:
-            csv_reader = csv.reader(csv_file)
-            for _ in csv_reader:
-                pass
+        function, row_count = _operation_function(operation, csv_path, scenario)
+        duration = min(timeit.repeat(function, number=1, repeat=repeat))
+        peak_memory = _peak_memory(function)
+        file_size = os.path.getsize(csv_path)
     finally:
-        if has_temp_file:
-            os.remove(_TEST_CSV_PATH)
+        os.remove(csv_path)
+    return {
+        'operation': operation,
+        'scenario': scenario_name(scenario),
+        'rows': row_count,
+        'bytes': file_size,
+        'seconds': duration,
+        'rows_per_second': row_count / duration,
+        'mb_per_second': file_size / _MEGABYTE / duration,
+        'peak_memory_bytes': peak_memory,
+    }
+
+
+_IMPORT_CODE = """
+import sys
+import timeit
+sys.path.insert(0, %r)
+start_time = timeit.default_timer()
+import csv342
+print(timeit.default_timer() - start_time)
+"""
+
+
+def benchmark_import(repeat=3):
+    """
+    Dictionary with the results of the fastest of ``repeat`` imports of
+    csv342 in a new process, where each import counts as a row.
+    """
+    import_code = _IMPORT_CODE % os.path.dirname(os.path.abspath(csv.__file__))
+    duration = min(
+        float(subprocess.check_output([sys.executable, '-c', import_code]).decode('ascii'))
+        for _ in range(repeat))
+    return {
+        'operation': 'import',
+        'scenario': 'new process',
+        'rows': 1,
+        'bytes': 0,
+        'seconds': duration,
+        'rows_per_second': 1 / duration,
+        'mb_per_second': 0.0,
+        'peak_memory_bytes': None,
+    }
+
+
+def run(operations=OPERATIONS, scale=1.0, repeat=3, log=None):
+    """
+    Dictionary with information about the environment and a list of the
+    results for importing csv342 and for each of the ``operations`` and
+    `scenarios()`.
+    """
+    results = [benchmark_import(repeat)]
+    if log is not None:
+        log(_result_line(results[0]))
+    for scenario in scenarios(scale):
+        for operation in operations:
+            result = benchmark(operation, scenario, repeat)
+            if log is not None:
+                log(_result_line(result))
+            results.append(result)
+    return {
+        'csv342_version': csv.__version__,
+        'python_version': platform.python_version(),
+        'python_implementation': platform.python_implementation(),
+        'results': results,
+    }
+
+
+def _result_line(result):
+    peak_memory = result['peak_memory_bytes']
+    peak_memory_text = '%8.1f' % (peak_memory / _MEGABYTE) if peak_memory is not None else '       -'
+    return '%-10s %12.0f rows/s %8.2f MB/s %s MB peak  %s' % (
+        result['operation'], result['rows_per_second'], result['mb_per_second'], peak_memory_text,
+        result['scenario'])
+
+
+def regressions(baseline_run, current_run, threshold=0.1):
+    """
+    List of ``(result_key, baseline_rows_per_second, current_rows_per_second)``
+    for each result of ``current_run`` with a throughput that is more than
+    ``threshold`` (a ratio) less than in ``baseline_run``.
+    """
+    def key_to_result_map(benchmark_run):
+        return dict(((result['operation'], result['scenario']), result) for result in benchmark_run['results'])
+
+    baseline_key_to_result_map = key_to_result_map(baseline_run)
+    result = []
+    for key, current_result in sorted(key_to_result_map(current_run).items()):
+        baseline_result = baseline_key_to_result_map.get(key)
+        if baseline_result is not None:
+            baseline_rows_per_second = baseline_result['rows_per_second']
+            current_rows_per_second = current_result['rows_per_second']
+            if current_rows_per_second < baseline_rows_per_second * (1 - threshold):
+                result.append((key, baseline_rows_per_second, current_rows_per_second))
+    return result
+
+
+def _read_run(json_path):
+    with io.open(json_path, encoding='utf-8') as json_file:
+        return json.load(json_file)
+
+
+def _write_run(json_path, benchmark_run):
+    with io.open(json_path, 'w', encoding='utf-8') as json_file:
+        json_file.write(type('')(json.dumps(benchmark_run, indent=2, sort_keys=True)))
+
+
+def _parsed_arguments(arguments):
+    parser = argparse.ArgumentParser(description='benchmark csv342 and compare results')
+    parser.add_argument(
+        '--compare', metavar='JSON', nargs='+',
+        help='baseline run to compare with; with a second run, compare these two without benchmarking')
+    parser.add_argument('--json', metavar='JSON', help='file to store the results in')
+    parser.add_argument(
+        '--operations', metavar='OPERATION', nargs='+', choices=OPERATIONS, default=list(OPERATIONS),
+        help='operations to benchmark (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs to take the fastest of (default: 3)')
+    parser.add_argument('--scale', type=float, default=1.0, help='factor to multiply the file sizes with (default: 1)')
+    parser.add_argument(
+        '--threshold', type=float, default=0.1,
+        help='ratio of lower throughput to report as regression (default: 0.1)')
+    result = parser.parse_args(arguments)
+    if result.compare is not None and len(result.compare) > 2:
+        parser.error('--compare must specify at most 2 runs')
+    return result
+
+
+def main(arguments=None):
+    """
+    Run benchmarks and compare them according to the command line
+    ``arguments``, and return 1 if there are regressions, otherwise 0.
+    """
+    options = _parsed_arguments(arguments)
+    if options.compare is not None and len(options.compare) == 2:
+        current_run = _read_run(options.compare[1])
+    else:
+        current_run = run(options.operations, options.scale, options.repeat, print)
+        if options.json is not None:
+            _write_run(options.json, current_run)
+    result = 0
+    if options.compare is not None:
+        for (operation, name), baseline_rows_per_second, current_rows_per_second in regressions(
+                _read_run(options.compare[0]), current_run, options.threshold):
+            print('regression: %s %s: %.0f rows/s instead of %.0f rows/s' % (
+                operation, name, current_rows_per_second, baseline_rows_per_second))
+            result = 1
+    return result
 
 
 if __name__ == '__main__':
-    duration = timeit.timeit('performance._read_and_write_csv()', 'import performance', number=10)
-    print('%.2f' % duration)
+    sys.exit(main())
@@ -36,13 +36,27 @@ Tests for csv342.
 from __future__ import unicode_literals
 from __future__ import with_statement
 
+import collections
+import datetime
+import decimal
 import doctest
+import gzip
 import io
+import json
 import os
+import subprocess
+import sys
+import tempfile
 import unittest
 from contextlib import closing
 
 import csv342 as csv
+import csv342_extras
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class _CsvTest(unittest.TestCase):
@@ -59,6 +73,94 @@ class _CsvTest(unittest.TestCase):
         assert name is not None
         return io.open(self._test_path(name), encoding=encoding, newline='')
 
+    def _temp_path(self, content, suffix='.csv'):
+        """
+        Path of a temporary file containing the bytes ``content``, which is
+        removed once the test has finished.
+        """
+        temp_fd, result = tempfile.mkstemp(prefix='test_csv342_', suffix=suffix)
+        self.addCleanup(os.remove, result)
+        with io.open(temp_fd, 'wb') as temp_file:
+            temp_file.write(content)
+        return result
+
+
+class ImportTest(unittest.TestCase):
+    #: Modules only some features need, which should not slow down importing.
+    _LAZY_MODULE_NAMES = (
+        'asyncio', 'datetime', 'decimal', 'json', 'mmap', 'multiprocessing', 'numbers', 'queue', 'Queue',
+        'threading')
+
+    #: Number of new processes to import a module in to measure how long it
+    #: takes at best.
+    _IMPORT_REPEAT = 5
+
+    @staticmethod
+    def _output_of(code):
+        """
+        Output of running ``code`` in a new process that can import csv342.
+        """
+        csv342_folder = os.path.dirname(os.path.abspath(csv.__file__))
+        return subprocess.check_output([
+            sys.executable, '-c', 'import sys; sys.path.insert(0, %r); %s' % (csv342_folder, code),
+        ]).decode('ascii')
+
+    def _imported_module_names(self, code):
+        return self._output_of(code + '; print(" ".join(sys.modules))').split()
+
+    def _import_seconds(self, module_name, imported_module_name):
+        """
+        Shortest time a new process that already imported
+        ``imported_module_name`` needs to import ``module_name``.
+        """
+        return min(
+            float(self._output_of(
+                'import timeit; import %s; start_time = timeit.default_timer(); import %s; '
+                'print(timeit.default_timer() - start_time)' % (imported_module_name, module_name)))
+            for _ in range(self._IMPORT_REPEAT))
+
+    def test_imports_modules_lazily(self):
+        imported_module_names = self._imported_module_names('import csv342')
+        self.assertEqual([], [name for name in self._LAZY_MODULE_NAMES if name in imported_module_names])
+
+    def test_imports_extras_lazily(self):
+        self.assertNotIn('csv342_extras', self._imported_module_names('import csv342'))
+        self.assertIn('csv342_extras', self._imported_module_names('import csv342; csv342.detect'))
+
+    @unittest.skipIf(csv.IS_PYTHON2, 'csv of Python 2 is too small to compare with')
+    def test_imports_faster_than_csv(self):
+        # Compile csv342 in advance so only importing it is measured.
+        self._output_of('sys.dont_write_bytecode = False; import csv342, csv342_extras')
+        csv342_seconds = self._import_seconds('csv342', 'csv')
+        csv_seconds = self._import_seconds('csv', 'sys')
+        self.assertLess(
+            csv342_seconds * 2, csv_seconds,
+            'importing csv342 must take less than half the time of importing csv: %f >= %f / 2' % (
+                csv342_seconds, csv_seconds))
+
+    def test_can_import_all_without_replacing_open(self):
+        names = {}
+        exec('from csv342 import *', names)
+        self.assertIn('DictReader', names)
+        self.assertIn('QUOTE_ALL', names)
+        self.assertNotIn('open', names)
+        for name in csv.__all__:
+            self.assertTrue(hasattr(csv, name), name)
+
+    def test_can_use_lazy_module(self):
+        self.assertEqual(decimal.Decimal('1.5'), csv._parsed_decimal('1.5'))
+        self.assertTrue(isinstance(1, csv.numbers.Integral))
+
+    @unittest.skipIf(sys.version_info < (3, 6), 'csv342_aio requires Python 3.6')
+    def test_can_import_aio_lazily(self):
+        self.assertTrue(hasattr(csv.aio, 'AsyncReader'))
+        self.assertRaises(AttributeError, getattr, csv, 'no_such_attribute')
+
+    def test_can_use_extras(self):
+        self.assertEqual(sorted(csv._EXTRAS_NAMES), sorted(csv342_extras.__all__))
+        for name in csv342_extras.__all__:
+            self.assertTrue(getattr(csv, name) is getattr(csv342_extras, name), name)
+
 
 class ReaderTest(_CsvTest):
     def _data(self, name, delimiter=',', encoding='utf-8'):
@@ -99,6 +201,557 @@ class ReaderTest(_CsvTest):
             with closing(StringIO.StringIO('a')) as csv_stream:
                 self.assertRaises(csv.Error, csv.reader, csv_stream)
 
+    def test_can_read_in_chunks(self):
+        if csv.IS_PYTHON2:
+            lines_to_read = 'ä,"b\r\nc"\r\nd\re\n\n"""f"""'
+            expected_rows = [['ä', 'b\r\nc'], ['d'], ['e'], [], ['"f"']]
+            for chunk_size in (1, 2, 3, 5, 1000):
+                with io.StringIO(lines_to_read, newline='') as csv_stream:
+                    actual_rows = list(csv.reader(csv_stream, chunk_size=chunk_size))
+                self.assertEqual(expected_rows, actual_rows, 'chunk_size=%d' % chunk_size)
+
+    def test_can_read_selected_columns(self):
+        lines_to_read = 'a,b,ä\n\n1,2\n1,2,3,4\n'
+        for usecols, expected_rows in (
+                ([2, 0], [['ä', 'a'], [], ['', '1'], ['3', '1']]),
+                ([1], [['b'], [], ['2'], ['2']])):
+            with io.StringIO(lines_to_read) as csv_stream:
+                actual_rows = list(csv.reader(csv_stream, usecols=usecols))
+            self.assertEqual(expected_rows, actual_rows)
+
+    def test_can_convert_columns(self):
+        lines_to_read = '1,2.5,true,2020-05-05,2020-05-05 12:34:56,1.10,x\n,,,,,,\n3\n'
+        dtypes = {0: 'int', 1: 'float', 2: 'bool', 3: 'date', 4: 'datetime', 5: 'decimal', 6: 'str'}
+        expected_rows = [
+            [1, 2.5, True, datetime.date(2020, 5, 5), datetime.datetime(2020, 5, 5, 12, 34, 56),
+             decimal.Decimal('1.10'), 'X'],
+            [None, None, None, None, None, None, ''],
+            [3],
+        ]
+        with io.StringIO(lines_to_read) as csv_stream:
+            actual_rows = list(csv.reader(csv_stream, dtypes=dtypes, converters={6: lambda text: text.upper()}))
+        self.assertEqual(expected_rows, actual_rows)
+
+    def test_can_convert_selected_columns(self):
+        with io.StringIO('a,1,b,2\n') as csv_stream:
+            actual_rows = list(csv.reader(csv_stream, usecols=[3, 1], dtypes={1: 'int', 3: 'float'}))
+        self.assertEqual([[2.0, 1]], actual_rows)
+
+    def test_can_intern_columns(self):
+        with io.StringIO('x,ä\ny,ä\nz,ä\n') as csv_stream:
+            rows = list(csv.reader(csv_stream, intern_columns=[1]))
+        self.assertEqual([['x', 'ä'], ['y', 'ä'], ['z', 'ä']], rows)
+        self.assertIs(rows[0][1], rows[1][1])
+        self.assertIs(rows[0][1], rows[2][1])
+        with io.StringIO('1,ä\n2,ä\n') as csv_stream:
+            rows = list(csv.reader(csv_stream, usecols=[1, 0], intern_columns=[1], dtypes={0: 'int'}))
+        self.assertEqual([['ä', 1], ['ä', 2]], rows)
+        self.assertIs(rows[0][0], rows[1][0])
+
+    def test_can_intern_with_limit(self):
+        def new_a():
+            return ''.join(['a', 'a'])
+
+        intern_cache = csv._InternCache(2)
+        a = intern_cache.intern(new_a())
+        for value in ('b', 'c'):
+            intern_cache.intern(value)
+        # 'aa' is in the previous generation and moves to the current one.
+        self.assertIs(a, intern_cache.intern(new_a()))
+        for value in ('d', 'e', 'f'):
+            intern_cache.intern(value)
+        self.assertIsNot(a, intern_cache.intern(new_a()))
+        self.assertRaises(ValueError, csv.reader, [], intern_columns=[0], intern_limit=0)
+
+    def test_fails_on_bad_conversion(self):
+        with io.StringIO('a\n') as csv_stream:
+            csv_reader = csv.reader(csv_stream, dtypes={0: 'int'})
+            self.assertRaises(ValueError, next, csv_reader)
+        self.assertRaises(ValueError, csv.reader, [], dtypes={0: 'xxx'})
+        self.assertRaises(ValueError, csv.reader, [], usecols=[0], dtypes={1: 'int'})
+
+    def test_fails_on_bad_python2_keywords(self):
+        self.assertRaises(ValueError, csv.reader, io.StringIO(), chunk_size=0)
+        self.assertRaises(ValueError, csv.writer, io.StringIO(), batch_row_count=0)
+        self.assertRaises(ValueError, csv.writer, io.StringIO(), batch_size=0)
+
+    def test_fails_on_bad_usecols(self):
+        for usecols in ([], ['a'], [-1]):
+            self.assertRaises(ValueError, csv.reader, [], usecols=usecols)
+
+    def test_can_read_utf8_from_binary_stream(self):
+        with io.BytesIO('ä,"b\r\nc"\r\nd\r\n'.encode('utf-8')) as csv_stream:
+            actual_rows = list(csv.reader(csv_stream))
+        self.assertEqual([['ä', 'b\r\nc'], ['d']], actual_rows)
+
+    def test_can_read_binary_file_and_keep_it_open(self):
+        with io.open(self._test_path('utf-8'), 'rb') as csv_file:
+            csv_reader = csv.reader(csv_file)
+            self.assertEqual([['\u20ac']], list(csv_reader))
+            del csv_reader
+            csv_file.seek(0)
+            self.assertEqual(b'\xe2\x82\xac', csv_file.read(3))
+
+    def test_can_read_binary_stream_with_encoding(self):
+        content = 'ä,"b\r\nc"\r\nd\r\n'
+        expected_rows = [['ä', 'b\r\nc'], ['d']]
+        for encoding in ('cp1252', 'utf-16-le', 'utf-32'):
+            with io.BytesIO(content.encode(encoding)) as csv_stream:
+                actual_rows = list(csv.reader(csv_stream, encoding=encoding, chunk_size=3))
+            self.assertEqual(expected_rows, actual_rows, 'encoding=%s' % encoding)
+
+    def test_can_read_binary_stream_with_bom(self):
+        content = 'ä,b\r\n'
+        for encoding in ('utf-8-sig', 'utf-16-le', 'utf-16-be', 'utf-32-le', 'utf-32-be'):
+            data = content.encode(encoding)
+            if not encoding.startswith('utf-8'):
+                data = '\ufeff'.encode(encoding) + data
+            with io.BytesIO(data) as csv_stream:
+                self.assertEqual([['ä', 'b']], list(csv.reader(csv_stream)), 'encoding=%s' % encoding)
+            csv_path = self._temp_path(data)
+            with io.open(csv_path, 'rb') as csv_file:
+                self.assertEqual([['ä', 'b']], list(csv.reader(csv_file)), 'encoding=%s' % encoding)
+
+    def test_can_read_binary_stream_with_errors(self):
+        with io.BytesIO(b'a,\xff\r\n') as csv_stream:
+            self.assertEqual([['a', '\ufffd']], list(csv.reader(csv_stream, errors='replace')))
+        with io.BytesIO(b'a,\xff\r\n') as csv_stream:
+            self.assertRaises(UnicodeDecodeError, list, csv.reader(csv_stream))
+
+    def test_can_read_rows_in_batches(self):
+        with io.StringIO('a\nb\nc\nd\ne') as csv_stream:
+            csv_reader = csv.reader(csv_stream)
+            self.assertEqual([['a'], ['b']], csv.read_rows(csv_reader, 2))
+            actual_batches = list(csv.iter_batches(csv_reader, 2))
+            self.assertEqual([], csv.read_rows(csv_reader, 2))
+        self.assertEqual([[['c'], ['d']], [['e']]], actual_batches)
+
+
+class OpenTest(_CsvTest):
+    _ROWS = [['ä', 'b\r\nc'], []] * 3
+
+    def _assert_can_write_and_read(self, suffix, compression='infer'):
+        csv_path = self._temp_path(b'', suffix)
+        with csv.open(csv_path, 'w', compression=compression) as csv_file:
+            csv.writer(csv_file).writerows(self._ROWS)
+        with csv.open(csv_path, compression=compression) as csv_file:
+            self.assertEqual(self._ROWS, list(csv.reader(csv_file)))
+        with csv.open(csv_path, 'rb', compression=compression) as binary_file:
+            self.assertEqual(self._ROWS, list(csv.reader(binary_file)))
+        return csv_path
+
+    def test_can_write_and_read_uncompressed(self):
+        csv_path = self._assert_can_write_and_read('.csv')
+        with io.open(csv_path, 'rb') as binary_file:
+            self.assertEqual('ä,"b\r\nc"\r\n\r\n'.encode('utf-8'), binary_file.read(13))
+
+    def test_can_write_and_read_gzip(self):
+        csv_path = self._assert_can_write_and_read('.csv.gz')
+        with gzip.GzipFile(csv_path) as gzip_file:
+            self.assertEqual('ä,'.encode('utf-8'), gzip_file.read(3))
+        self._assert_can_write_and_read('.tmp', 'gzip')
+
+    def test_can_write_and_read_bz2(self):
+        self._assert_can_write_and_read('.csv.bz2')
+
+    @unittest.skipIf(csv.IS_PYTHON2, 'lzma requires Python 3')
+    def test_can_write_and_read_xz(self):
+        self._assert_can_write_and_read('.csv.xz')
+
+    def test_fails_on_broken_mode(self):
+        for mode in ('', 'rw', 'rt+', 'q'):
+            self.assertRaises(ValueError, csv.open, self._test_path('utf-8'), mode)
+
+    def test_fails_on_unknown_compression(self):
+        self.assertRaises(ValueError, csv.open, self._test_path('utf-8'), compression='rar')
+
+
+class MmapReaderTest(_CsvTest):
+    def test_can_read_rows_with_offsets(self):
+        csv_path = self._temp_path('ä,"b\r\nc"\r\n\r\nd\r\n'.encode('utf-8'))
+        with csv.mmap_reader(csv_path) as csv_reader:
+            offsets_and_rows = [(csv_reader.offset, row) for row in csv_reader]
+            self.assertEqual([(0, ['ä', 'b\r\nc']), (11, []), (13, ['d'])], offsets_and_rows)
+            csv_reader.seek(11)
+            self.assertEqual([[], ['d']], list(csv_reader))
+
+    def test_can_skip_utf8_bom(self):
+        csv_path = self._temp_path(b'\xef\xbb\xbfa,b\r\n1,2\r\n')
+        for encoding in ('utf-8', 'utf-8-sig'):
+            with csv.MmapDictReader(csv_path, encoding=encoding) as csv_reader:
+                self.assertEqual(['a', 'b'], csv_reader.fieldnames)
+                self.assertEqual([{'a': '1', 'b': '2'}], list(csv_reader))
+            self.assertEqual([['a', 'b'], ['1', '2']], list(csv.parallel_reader(csv_path, workers=1)))
+        index_path = csv_path + '.a' + csv.KEY_INDEX_SUFFIX
+        self.addCleanup(os.remove, index_path)
+        with csv.KeyIndex(csv_path, 'a') as key_index:
+            self.assertEqual([{'a': '1', 'b': '2'}], key_index.lookup('1'))
+
+    def test_can_read_cp1252(self):
+        with csv.mmap_reader(self._test_path('cp1252'), encoding='cp1252') as csv_reader:
+            self.assertEqual([['\u20ac']], list(csv_reader))
+
+    def test_can_read_empty_file(self):
+        with csv.mmap_reader(self._temp_path(b'')) as csv_reader:
+            self.assertEqual([], list(csv_reader))
+
+    def test_fails_on_ascii_incompatible_encoding(self):
+        self.assertRaises(ValueError, csv.mmap_reader, self._test_path('utf-8'), encoding='utf-16')
+
+    def test_can_read_dicts_with_offsets(self):
+        csv_path = self._temp_path(b'a,b\r\n1,2\r\n3,4\r\n')
+        with csv.MmapDictReader(csv_path) as csv_reader:
+            offsets_and_rows = [(csv_reader.offset, row) for row in csv_reader]
+        self.assertEqual([(5, {'a': '1', 'b': '2'}), (10, {'a': '3', 'b': '4'})], offsets_and_rows)
+
+
+class IndexedReaderTest(_CsvTest):
+    def _csv_path_and_rows(self):
+        rows = [['%d' % row_number, 'ä\r\n"x"' if row_number % 3 == 0 else ''] for row_number in range(10)]
+        rows[4] = []
+        with io.StringIO(newline='') as csv_stream:
+            csv.writer(csv_stream).writerows(rows)
+            content = csv_stream.getvalue().encode('utf-8')
+        return self._temp_path(content), rows
+
+    def test_can_seek_rows(self):
+        csv_path, rows = self._csv_path_and_rows()
+        self.addCleanup(os.remove, csv.build_index(csv_path, every=3))
+        with csv.IndexedReader(csv_path) as csv_reader:
+            self.assertEqual(10, len(csv_reader))
+            for row_number in (7, 0, 4, 9, 3):
+                csv_reader.seek_row(row_number)
+                self.assertEqual(rows[row_number], next(csv_reader))
+            csv_reader.seek_row(5)
+            self.assertEqual(rows[5:], list(csv_reader))
+            csv_reader.seek_row(10)
+            self.assertEqual([], list(csv_reader))
+            self.assertRaises(IndexError, csv_reader.seek_row, 11)
+
+    def test_can_index_and_slice(self):
+        csv_path, rows = self._csv_path_and_rows()
+        self.addCleanup(os.remove, csv_path + csv.INDEX_SUFFIX)
+        with csv.IndexedReader(csv_path) as csv_reader:
+            self.assertEqual(rows[-1], csv_reader[-1])
+            self.assertEqual(rows[2:8:2], csv_reader[2:8:2])
+            self.assertEqual(rows[8:1:-3], csv_reader[8:1:-3])
+            self.assertEqual([], csv_reader[5:5])
+            self.assertRaises(IndexError, csv_reader.__getitem__, 10)
+        self.assertTrue(os.path.exists(csv_path + csv.INDEX_SUFFIX))
+
+    def test_can_rebuild_outdated_index(self):
+        csv_path = self._temp_path(b'a\r\n')
+        index_path = self._temp_path(b'')
+        csv.build_index(csv_path, index_path=index_path)
+        with io.open(csv_path, 'ab') as csv_file:
+            csv_file.write(b'b,c\r\n')
+        with csv.IndexedReader(csv_path, index_path=index_path) as csv_reader:
+            self.assertEqual(2, len(csv_reader))
+            self.assertEqual(['b', 'c'], csv_reader[1])
+
+    def test_can_index_empty_file(self):
+        csv_path = self._temp_path(b'')
+        self.addCleanup(os.remove, csv_path + csv.INDEX_SUFFIX)
+        with csv.IndexedReader(csv_path) as csv_reader:
+            self.assertEqual(0, len(csv_reader))
+            self.assertEqual([], csv_reader[:])
+
+    def test_fails_on_broken_index(self):
+        csv_path = self._temp_path(b'a\r\n')
+        index_path = self._temp_path(b'something else')
+        self.assertRaises(ValueError, csv.IndexedReader, csv_path, index_path=index_path)
+
+
+class FollowTest(_CsvTest):
+    def setUp(self):
+        self.csv_path = self._temp_path(b'')
+        self.addCleanup(self._remove_if_exists, self.csv_path + csv.CHECKPOINT_SUFFIX)
+
+    @staticmethod
+    def _remove_if_exists(path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _append(self, content):
+        with io.open(self.csv_path, 'ab') as csv_file:
+            csv_file.write(content)
+
+    def _followed_rows(self, **keywords):
+        return list(csv.follow(self.csv_path, poll_interval=None, **keywords))
+
+    def test_can_follow_growing_file(self):
+        self._append(b'a,b\r\n')
+        self.assertEqual([['a', 'b']], self._followed_rows())
+        self._append(b'c,d\r\ne,f\r\n')
+        self.assertEqual([['c', 'd'], ['e', 'f']], self._followed_rows())
+        self.assertEqual([], self._followed_rows())
+
+    def test_can_hold_back_partial_record(self):
+        self._append(b'a,b\r\nc,"d\r\n')
+        self.assertEqual([['a', 'b']], self._followed_rows())
+        self._append(b'e"')
+        self.assertEqual([], self._followed_rows())
+        self._append(b',\xc3\xa4\r\n')
+        self.assertEqual([['c', 'd\r\ne', '\u00e4']], self._followed_rows())
+
+    def test_can_poll_in_small_chunks(self):
+        content = b'a,"b\n""c""\n"\r\n\r\nd\r\n'
+        self._append(content)
+        follower = csv.follow(self.csv_path, checkpoint_path=False, chunk_size=3)
+        self.assertEqual([['a', 'b\n"c"\n'], [], ['d']], list(follower.poll()))
+        self.assertEqual(len(content), follower.offset)
+
+    def test_can_move_offset_after_each_row(self):
+        self._append(b'a\r\nbc\r\n')
+        follower = csv.follow(self.csv_path, checkpoint_path=False)
+        rows = follower.poll()
+        self.assertEqual(['a'], next(rows))
+        self.assertEqual(3, follower.offset)
+        self.assertEqual(['bc'], next(rows))
+        self.assertEqual(7, follower.offset)
+
+    def test_can_skip_utf8_bom(self):
+        self._append(b'\xef\xbb\xbfa\r\n')
+        self.assertEqual([['a']], self._followed_rows())
+
+    def test_can_restart_after_truncation(self):
+        self._append(b'a,b\r\nc,d\r\n')
+        self.assertEqual(2, len(self._followed_rows()))
+        with io.open(self.csv_path, 'wb') as csv_file:
+            csv_file.write(b'e\r\n')
+        self.assertEqual([['e']], self._followed_rows())
+
+    def test_can_restart_after_replacement(self):
+        self._append(b'a,b\r\n')
+        self.assertEqual([['a', 'b']], self._followed_rows())
+        # Write the new file before removing the old one so that they cannot
+        # share the same inode.
+        replacing_path = self.csv_path + '.new'
+        with io.open(replacing_path, 'wb') as replacing_file:
+            replacing_file.write(b'cc,dd\r\ne,f\r\n')
+        os.remove(self.csv_path)
+        os.rename(replacing_path, self.csv_path)
+        self.assertEqual([['cc', 'dd'], ['e', 'f']], self._followed_rows())
+
+    def test_can_follow_without_checkpoint(self):
+        self._append(b'a\r\n')
+        self.assertEqual([['a']], self._followed_rows(checkpoint_path=False))
+        self.assertEqual([['a']], self._followed_rows(checkpoint_path=False))
+        self.assertFalse(os.path.exists(self.csv_path + csv.CHECKPOINT_SUFFIX))
+
+    def test_fails_on_broken_checkpoint(self):
+        checkpoint_path = self._temp_path(b'broken')
+        self.assertRaises(ValueError, csv.follow, self.csv_path, checkpoint_path=checkpoint_path)
+
+
+class ParallelReaderTest(_CsvTest):
+    def _csv_path_and_rows(self):
+        rows = [['a', 'b'], ['ä' * 3, 'x\r\n"y"\r\nz'], []] * 20
+        with io.StringIO(newline='') as csv_stream:
+            csv.writer(csv_stream).writerows(rows)
+            content = csv_stream.getvalue().encode('utf-8')
+        return self._temp_path(content), rows
+
+    def test_can_read_in_order(self):
+        csv_path, expected_rows = self._csv_path_and_rows()
+        for chunk_size in (1, 7, 100, 100000):
+            actual_rows = list(csv.parallel_reader(csv_path, workers=2, chunk_size=chunk_size))
+            self.assertEqual(expected_rows, actual_rows, 'chunk_size=%d' % chunk_size)
+
+    def test_can_read_unordered(self):
+        csv_path, expected_rows = self._csv_path_and_rows()
+        actual_rows = list(csv.parallel_reader(csv_path, workers=2, chunk_size=20, ordered=False))
+        self.assertEqual(sorted(expected_rows), sorted(actual_rows))
+
+    def test_can_read_empty_file(self):
+        self.assertEqual([], list(csv.parallel_reader(self._temp_path(b''), workers=1)))
+
+    def test_fails_on_escapechar(self):
+        csv_path = self._test_path('utf-8')
+        self.assertRaises(ValueError, list, csv.parallel_reader(csv_path, escapechar='\\'))
+
+
+class ParallelWriterTest(_CsvTest):
+    def _written_content(self, rows, **keywords):
+        csv_path = self._temp_path(b'')
+        with csv.parallel_writer(csv_path, workers=2, **keywords) as csv_writer:
+            csv_writer.writerows(rows)
+        with io.open(csv_path, 'rb') as csv_file:
+            return csv_file.read()
+
+    def test_can_write_in_order(self):
+        rows = [['a', 'b'], ['\u00e4' * 3, 'x\r\n"y"\r\nz'], [], [1, None]] * 20
+        with io.StringIO(newline='') as csv_stream:
+            csv.writer(csv_stream).writerows(rows)
+            expected_content = csv_stream.getvalue().encode('utf-8')
+        for batch_row_count in (1, 7, 1000):
+            self.assertEqual(
+                expected_content, self._written_content(rows, batch_row_count=batch_row_count),
+                'batch_row_count=%d' % batch_row_count)
+
+    def test_can_write_reused_row(self):
+        csv_path = self._temp_path(b'')
+        row = ['x', 0]
+        with csv.parallel_writer(csv_path, workers=2, batch_row_count=2) as csv_writer:
+            for number in range(4):
+                row[1] = number
+                csv_writer.writerow(row)
+        with io.open(csv_path, 'rb') as csv_file:
+            self.assertEqual(b'x,0\r\nx,1\r\nx,2\r\nx,3\r\n', csv_file.read())
+
+    def test_can_write_with_dialect_and_encoding(self):
+        content = self._written_content([['\u00e4', 'b;c']], delimiter=';', encoding='cp1252')
+        self.assertEqual(b'\xe4;"b;c"\r\n', content)
+
+    def test_can_write_compressed(self):
+        csv_path = self._temp_path(b'', suffix='.csv.gz')
+        with csv.parallel_writer(csv_path, workers=1) as csv_writer:
+            csv_writer.writerow(['a', 'b'])
+        with gzip.open(csv_path, 'rb') as csv_file:
+            self.assertEqual(b'a,b\r\n', csv_file.read())
+
+    def test_fails_on_broken_batch_row_count(self):
+        self.assertRaises(ValueError, csv.parallel_writer, self._temp_path(b''), batch_row_count=0)
+
+
+class _BrokenStream(object):
+    def __init__(self, lines_before_error):
+        self._lines = iter(lines_before_error)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._lines)
+        except StopIteration:
+            raise IOError('broken stream')
+
+    def next(self):
+        return self.__next__()
+
+    def write(self, data):
+        raise IOError('broken stream')
+
+
+class PrefetchingReaderTest(_CsvTest):
+    def test_can_prefetch_rows(self):
+        lines_to_read = ['%d,"x\r\n"\r\n' % line_number for line_number in range(10)]
+        expected_line_nums_and_rows = [
+            (row_number if csv.IS_PYTHON2 else row_number + 1, [str(row_number), 'x\r\n'])
+            for row_number in range(10)
+        ]
+        for batch_row_count in (1, 3, 100):
+            with csv.PrefetchingReader(csv.reader(lines_to_read), batch_row_count=batch_row_count) as csv_reader:
+                actual_line_nums_and_rows = [(csv_reader.line_num, row) for row in csv_reader]
+            self.assertEqual(expected_line_nums_and_rows, actual_line_nums_and_rows)
+
+    def test_fails_after_rows_before_error(self):
+        with csv.PrefetchingReader(csv.reader(_BrokenStream(['a\n', 'b\n']))) as csv_reader:
+            self.assertEqual(['a'], next(csv_reader))
+            self.assertEqual(['b'], next(csv_reader))
+            self.assertRaises(IOError, next, csv_reader)
+            self.assertRaises(StopIteration, next, csv_reader)
+
+
+class WriteBehindWriterTest(_CsvTest):
+    def test_can_write_rows_behind(self):
+        with io.StringIO(newline='') as csv_stream:
+            with csv.WriteBehindWriter(csv.writer(csv_stream), batch_row_count=3) as csv_writer:
+                row = []
+                for row_number in range(10):
+                    row[:] = ['ä', row_number]
+                    csv_writer.writerow(row)
+                csv_writer.flush()
+                self.assertEqual(''.join('\xe4,%d\r\n' % row_number for row_number in range(10)), csv_stream.getvalue())
+                csv_writer.writerows([['x']])
+            self.assertTrue(csv_stream.getvalue().endswith('\r\nx\r\n'))
+
+    def test_can_write_dicts_behind(self):
+        with io.StringIO(newline='') as csv_stream:
+            with csv.WriteBehindWriter(csv.DictWriter(csv_stream, ['a', 'b'])) as csv_writer:
+                csv_writer.writeheader()
+                csv_writer.writerow({'a': 1, 'b': 2})
+            self.assertEqual('a,b\r\n1,2\r\n', csv_stream.getvalue())
+
+    def test_can_write_records_behind(self):
+        with io.StringIO('a,b\r\n1,2\r\n', newline='') as csv_source:
+            records = list(csv.DictReader(csv_source, row_type='record'))
+        with io.StringIO(newline='') as csv_stream:
+            with csv.WriteBehindWriter(csv.DictWriter(csv_stream, ['a', 'b'])) as csv_writer:
+                csv_writer.writerows(records)
+            self.assertEqual('1,2\r\n', csv_stream.getvalue())
+
+    def test_fails_on_broken_target(self):
+        csv_writer = csv.WriteBehindWriter(csv.writer(_BrokenStream([])))
+        csv_writer.writerow(['a'])
+        self.assertRaises(IOError, csv_writer.flush)
+        self.assertRaises(IOError, csv_writer.writerow, ['b'])
+        self.assertRaises(IOError, csv_writer.close)
+
+
+class StatisticsTest(_CsvTest):
+    def test_can_measure_reader(self):
+        progress_rows = []
+        statistics = csv.Statistics()
+        with io.StringIO('ä,b\r\nc\r\n"d\r\ne",f,g\r\n') as csv_stream:
+            csv_reader = csv.reader(
+                csv_stream, statistics=statistics, progress=lambda statistics: progress_rows.append(statistics.rows),
+                progress_every=2)
+            self.assertEqual([['ä', 'b'], ['c'], ['d\r\ne', 'f', 'g']], list(csv_reader))
+        self.assertIs(statistics, csv_reader.statistics)
+        self.assertEqual(3, csv_reader.line_num if csv.IS_PYTHON2 else csv_reader.line_num - 1)
+        self.assertEqual([2], progress_rows)
+        self.assertEqual(3, statistics.rows)
+        self.assertEqual(6, statistics.fields)
+        self.assertEqual(21 if csv.IS_PYTHON2 else 20, statistics.data_size)
+        self.assertGreater(statistics.parse_seconds, 0)
+        self.assertGreater(statistics.transcode_seconds, 0)
+
+    def test_can_measure_binary_reader(self):
+        with io.BytesIO('ä\r\n'.encode('utf-8')) as binary_stream:
+            csv_reader = csv.reader(binary_stream, progress=lambda _: None)
+            self.assertEqual([['ä']], list(csv_reader))
+        self.assertEqual(1, csv_reader.statistics.rows)
+
+    def test_can_measure_writer(self):
+        progress_rows = []
+        with io.StringIO(newline='') as csv_stream:
+            csv_writer = csv.writer(
+                csv_stream, progress=lambda statistics: progress_rows.append(statistics.rows), progress_every=1)
+            csv_writer.writerow(['ä', 'b'])
+            csv_writer.writerows([['c'], ['d']])
+            self.assertEqual('ä,b\r\nc\r\nd\r\n', csv_stream.getvalue())
+        statistics = csv_writer.statistics
+        self.assertEqual([1, 2, 3], progress_rows)
+        self.assertEqual(3, statistics.rows)
+        self.assertEqual(4, statistics.fields)
+        self.assertEqual(12 if csv.IS_PYTHON2 else 11, statistics.data_size)
+        self.assertGreater(statistics.parse_seconds, 0)
+        self.assertGreater(statistics.transcode_seconds, 0)
+
+    def test_can_measure_dicts(self):
+        statistics = csv.Statistics()
+        with io.StringIO(newline='') as csv_stream:
+            dict_writer = csv.DictWriter(csv_stream, ['a', 'b'], statistics=statistics)
+            dict_writer.writeheader()
+            dict_writer.writerows([{'a': 1, 'b': 2}, {'a': 3}])
+            self.assertIs(statistics, dict_writer.statistics)
+            self.assertEqual(3, statistics.rows)
+            csv_stream.seek(0)
+            dict_reader = csv.DictReader(csv_stream, statistics=csv.Statistics())
+            self.assertEqual(2, len(list(dict_reader)))
+        self.assertEqual(3, dict_reader.statistics.rows)
+
+    def test_can_omit_statistics(self):
+        with io.StringIO() as csv_stream:
+            self.assertIsNone(csv.DictReader(csv_stream).statistics)
+            self.assertIsNone(csv.DictWriter(csv_stream, ['a']).statistics)
+
+    def test_fails_on_broken_progress_every(self):
+        with io.StringIO() as csv_stream:
+            self.assertRaises(ValueError, csv.reader, csv_stream, progress_every=0)
+
 
 class ExamplesText(_CsvTest):
     # FIXME: For some reason, the test code causes EOF errors when indented.
@@ -121,6 +774,110 @@ class WriterTest(_CsvTest):
                 '\xe4,b,c\r\n\r\n1,,3\r\n',
                 csv_stream.getvalue())
 
+    def test_can_write_rows_in_batches(self):
+        if csv.IS_PYTHON2:
+            rows = [['ä', str(row_number), None] for row_number in range(25)]
+            expected_content = ''.join('\xe4,%d,\r\n' % row_number for row_number in range(25))
+            for batch_row_count, batch_size in ((1, 1024), (7, 1024), (1000, 20), (1000, 1024)):
+                with io.StringIO(newline='') as csv_stream:
+                    csv_writer = csv.writer(csv_stream, batch_row_count=batch_row_count, batch_size=batch_size)
+                    csv_writer.writerows(rows)
+                    self.assertEqual(expected_content, csv_stream.getvalue())
+
+    def test_can_convert_columns(self):
+        with io.StringIO(newline='') as csv_stream:
+            csv_writer = csv.writer(csv_stream, dtypes={0: 'date', 1: 'float'}, converters={2: '{0:03d}'.format})
+            csv_writer.writerow([datetime.date(2020, 5, 5), 0.1, 7])
+            csv_writer.writerows([[None, None, None]])
+            self.assertEqual('2020-05-05,0.1,007\r\n,,\r\n', csv_stream.getvalue())
+
+    def test_can_write_float_dtype_of_other_number_types(self):
+        with io.StringIO(newline='') as csv_stream:
+            csv_writer = csv.writer(csv_stream, dtypes={0: 'float', 1: 'float'})
+            csv_writer.writerow([decimal.Decimal('1.5'), 2])
+            self.assertEqual('1.5,2.0\r\n', csv_stream.getvalue())
+            csv_stream.seek(0)
+            self.assertEqual([[1.5, 2.0]], list(csv.reader(csv_stream, dtypes={0: 'float', 1: 'float'})))
+
+    @unittest.skipIf(numpy is None, 'numpy must be installed')
+    def test_can_write_float_dtype_of_numpy_float(self):
+        with io.StringIO(newline='') as csv_stream:
+            csv.writer(csv_stream, dtypes={0: 'float'}).writerow([numpy.float64(1.5)])
+            self.assertEqual('1.5\r\n', csv_stream.getvalue())
+
+    def test_can_write_rows_before_broken_row(self):
+        with io.StringIO(newline='') as csv_stream:
+            csv_writer = csv.writer(csv_stream)
+            self.assertRaises((TypeError, csv.Error), csv_writer.writerows, [['a'], ['b'], 3])
+            self.assertEqual('a\r\nb\r\n', csv_stream.getvalue())
+
+
+class DetectTest(_CsvTest):
+    def setUp(self):
+        csv342_extras._detected_dialects.clear()
+
+    def _assert_detects(self, content, delimiter, has_header):
+        csv_path = self._temp_path(content.encode('utf-8'))
+        dialect = csv.detect(csv_path)
+        self.assertEqual(delimiter, dialect.delimiter)
+        self.assertEqual(has_header, dialect.has_header)
+        with io.open(csv_path, encoding='utf-8', newline='') as csv_file:
+            return list(csv.reader(csv_file, dialect))
+
+    def test_can_detect_delimiter_and_header(self):
+        rows = self._assert_detects('name;size\r\n"a;b";1\r\nä;22\r\n', ';', True)
+        self.assertEqual([['name', 'size'], ['a;b', '1'], ['ä', '22']], rows)
+        self._assert_detects('a\tb,c\td\n1\t2,3\t4\n', '\t', True)
+        self._assert_detects('1,2\n3,4\n', ',', False)
+        self._assert_detects('x', ',', False)
+
+    def test_can_detect_quotechar(self):
+        rows = self._assert_detects("id,name\n1,'twas brillig\n2,x\n3,y\n", ',', True)
+        self.assertEqual([['id', 'name'], ['1', "'twas brillig"], ['2', 'x'], ['3', 'y']], rows)
+        rows = self._assert_detects("name,size\n'a,b',1\nc,22\n", ',', True)
+        self.assertEqual([['name', 'size'], ['a,b', '1'], ['c', '22']], rows)
+
+    def test_can_detect_skipinitialspace(self):
+        rows = self._assert_detects('name, size\na, 1\n', ',', True)
+        self.assertEqual([['name', 'size'], ['a', '1']], rows)
+
+    def test_can_detect_stream(self):
+        with io.StringIO('x,y\na|b,c|d\n') as csv_stream:
+            csv_stream.readline()
+            self.assertEqual('|', csv.detect(csv_stream).delimiter)
+            self.assertEqual(4, csv_stream.tell())
+        with io.BytesIO('a;ä\n1;2\n'.encode('utf-8')) as binary_stream:
+            self.assertEqual(';', csv.detect(binary_stream, sample_size=7).delimiter)
+
+    def test_can_cache_detected_dialect(self):
+        csv_path = self._temp_path(b'a;b\n')
+        cache_path = self._temp_path(b'{}', '.json')
+        self.assertEqual(';', csv.detect(csv_path, cache_path=cache_path).delimiter)
+        with io.open(cache_path, encoding='utf-8') as cache_file:
+            cached_text = cache_file.read().replace('";"', '":"')
+        with io.open(cache_path, 'w', encoding='utf-8') as cache_file:
+            cache_file.write(cached_text)
+        self.assertEqual(';', csv.detect(csv_path, cache_path=cache_path).delimiter)
+        csv342_extras._detected_dialects.clear()
+        self.assertEqual(':', csv.detect(csv_path, cache_path=cache_path).delimiter)
+
+    def test_can_use_broken_cache_file(self):
+        csv_path = self._temp_path(b'a;b\n')
+        cache_path = self._temp_path(b'', '.json')
+        self.assertEqual(';', csv.detect(csv_path, cache_path=cache_path).delimiter)
+        csv342_extras._detected_dialects.clear()
+        self.assertEqual(';', csv.detect(csv_path, cache_path=cache_path).delimiter)
+
+    def test_can_prune_cache_file(self):
+        csv_path = self._temp_path(b'a;b\n')
+        cache_path = self._temp_path(b'{}', '.json')
+        csv.detect(csv_path, cache_path=cache_path)
+        with io.open(csv_path, 'ab') as csv_file:
+            csv_file.write(b'c;d\n')
+        csv.detect(csv_path, cache_path=cache_path)
+        with io.open(cache_path, encoding='utf-8') as cache_file:
+            self.assertEqual(1, len(json.load(cache_file)))
+
 
 class DictReaderTest(unittest.TestCase):
     def test_can_read_using_specific_fieldnames(self):
@@ -161,11 +918,272 @@ class DictReaderTest(unittest.TestCase):
         names_to_values = list(csv.DictReader(lines_to_read, delimiter=','))
         self.assertEqual(expected_data, names_to_values)
 
+    def test_can_read_selected_columns(self):
+        lines_to_read = 'a,b,c\nx,yy,zzz\n,y\n'
+        expected_data = [
+            {'c': 'zzz', 'a': 'x'},
+            {'c': '?', 'a': ''},
+        ]
+        for usecols in (['c', 'a'], [2, 0], ['c', 0]):
+            for row_type in ('dict', 'record'):
+                with io.StringIO(lines_to_read) as csv_file:
+                    csv_reader = csv.DictReader(csv_file, restval='?', usecols=usecols, row_type=row_type)
+                    names_to_values = list(csv_reader)
+                self.assertEqual(expected_data, names_to_values)
+                self.assertEqual(['a', 'b', 'c'], csv_reader.fieldnames)
+
+    def test_can_convert_columns(self):
+        lines_to_read = 'a,b,c\n1,x,2\n3\n'
+        expected_data = [
+            {'a': 1, 'c': 2.0},
+            {'a': 3, 'c': '?'},
+        ]
+        for usecols in (None, ['a', 'c']):
+            with io.StringIO(lines_to_read) as csv_file:
+                csv_reader = csv.DictReader(
+                    csv_file, restval='?', usecols=usecols, dtypes={'a': 'int'}, converters={2: float})
+                names_to_values = [
+                    dict((name, value) for name, value in row.items() if name != 'b') for row in csv_reader]
+            self.assertEqual(expected_data, names_to_values)
+
+    def test_can_intern_columns(self):
+        lines_to_read = 'a,b,c\n1,ä,x\n2,ä,x\n'
+        for usecols in (None, ['c', 'b']):
+            with io.StringIO(lines_to_read) as csv_file:
+                rows = list(csv.DictReader(csv_file, usecols=usecols, intern_columns=['b', 2]))
+            self.assertEqual('ä', rows[0]['b'])
+            self.assertIs(rows[0]['b'], rows[1]['b'])
+            self.assertIs(rows[0]['c'], rows[1]['c'])
+
+    def test_fails_on_unknown_usecols(self):
+        for usecols in (['x'], [3]):
+            csv_reader = csv.DictReader(['a,b,c', '1,2,3'], usecols=usecols)
+            self.assertRaises(ValueError, next, csv_reader)
+
+    def test_can_read_from_binary_stream(self):
+        with io.BytesIO('a,b\r\n1,ä\r\n'.encode('utf-8')) as csv_stream:
+            names_to_values = list(csv.DictReader(csv_stream))
+        self.assertEqual([{'a': '1', 'b': 'ä'}], names_to_values)
+
+    def test_can_read_from_binary_stream_with_encoding(self):
+        with io.BytesIO('a,b\r\n1,ä\r\n'.encode('utf-16')) as csv_stream:
+            names_to_values = list(csv.DictReader(csv_stream))
+        self.assertEqual([{'a': '1', 'b': 'ä'}], names_to_values)
+        with io.BytesIO('a,b\r\n1,ä\r\n'.encode('cp1252')) as csv_stream:
+            names_to_values = list(csv.DictReader(csv_stream, encoding='cp1252'))
+        self.assertEqual([{'a': '1', 'b': 'ä'}], names_to_values)
+
     def test_can_read_from_empty_list(self):
         names_to_values = list(csv.DictReader([]))
         self.assertEqual([], names_to_values)
 
 
+class RecordTest(unittest.TestCase):
+    def _records(self, lines_to_read, **keywords):
+        with io.StringIO(lines_to_read) as csv_file:
+            return list(csv.DictReader(csv_file, row_type='record', **keywords))
+
+    def test_can_read_records(self):
+        records = self._records('a,b,c\nx,yy,zzz\n,y\n1,2,3,4,5\n', restkey='rest', restval='?')
+        self.assertEqual([
+            {'a': 'x', 'b': 'yy', 'c': 'zzz'},
+            {'a': '', 'b': 'y', 'c': '?'},
+            {'a': '1', 'b': '2', 'c': '3', 'rest': ['4', '5']},
+        ], [dict(record) for record in records])
+        first_record = records[0]
+        self.assertTrue(isinstance(first_record, csv.Record))
+        self.assertEqual('yy', first_record['b'])
+        self.assertEqual(['a', 'b', 'c'], list(first_record.keys()))
+        self.assertEqual(3, len(first_record))
+        self.assertTrue('a' in first_record)
+        self.assertFalse('rest' in first_record)
+        self.assertEqual(None, first_record.get('rest'))
+        self.assertRaises(KeyError, first_record.__getitem__, 'rest')
+        self.assertEqual(['4', '5'], records[2]['rest'])
+        self.assertEqual(4, len(records[2]))
+
+    def test_can_compare_records_with_dicts(self):
+        records = self._records('a,b\n1,2\n')
+        self.assertEqual([{'a': '1', 'b': '2'}], records)
+        self.assertEqual(records, [{'a': '1', 'b': '2'}])
+
+    def test_shares_layout_between_records(self):
+        records = self._records('a\n1\n2\n')
+        self.assertTrue(records[0]._layout is records[1]._layout)
+
+    def test_fails_on_unknown_row_type(self):
+        self.assertRaises(ValueError, csv.DictReader, [], row_type='xxx')
+
+
+class PipelineTest(unittest.TestCase):
+    _LINES_TO_READ = 'name,size,color\r\nä,1,red\r\nb,20,green\r\n\r\näb,300\r\nc,x,blue\r\n'
+
+    def test_can_filter_and_write(self):
+        with io.StringIO(self._LINES_TO_READ) as csv_stream, io.StringIO(newline='') as target_stream:
+            row_count = csv.pipeline(csv_stream) \
+                .where_prefix('name', 'ä') \
+                .where_range('size', minimum=100, convert=int) \
+                .select('size', 'name') \
+                .to_writer(target_stream)
+            self.assertEqual(1, row_count)
+            self.assertEqual('size,name\r\n300,äb\r\n', target_stream.getvalue())
+
+    def test_can_iterate_dicts(self):
+        with io.StringIO(self._LINES_TO_READ) as csv_stream:
+            rows = list(csv.pipeline(csv_stream).where_equal('name', 'äb'))
+        self.assertEqual([{'name': 'äb', 'size': '300', 'color': None}], rows)
+
+    def test_can_map_and_filter_in_order(self):
+        with io.StringIO(self._LINES_TO_READ) as csv_stream:
+            rows = list(
+                csv.pipeline(csv_stream)
+                .where(lambda row: row['color'] is not None)
+                .map(lambda row: dict(row, name=row['name'].upper()))
+                .where_prefix('name', 'B')
+                .select('color'))
+        self.assertEqual([{'color': 'green'}], rows)
+
+    def test_can_process_rows_without_header(self):
+        with io.StringIO(self._LINES_TO_READ) as csv_stream:
+            pipeline = csv.pipeline(csv_stream, header=False).where_range(1, '1', '4').select(2, 0)
+            self.assertEqual([['red', 'ä'], ['green', 'b'], [None, 'äb']], list(pipeline))
+        with io.StringIO('a;b\r\nc;d\r\n') as csv_stream, io.StringIO(newline='') as target_stream:
+            csv.pipeline(csv_stream, header=False, delimiter=';').where_equal(0, 'c').to_writer(target_stream)
+            self.assertEqual('c,d\r\n', target_stream.getvalue())
+
+    def test_can_filter_after_select(self):
+        with io.StringIO('x,q,z\r\nq,z,x\r\n') as csv_stream:
+            pipeline = csv.pipeline(csv_stream, header=False).select(2, 0).where_equal(0, 'x')
+            self.assertEqual([['x', 'q']], list(pipeline))
+        with io.StringIO('x,q,z\r\nq,z,x\r\n') as csv_stream:
+            pipeline = csv.pipeline(csv_stream, header=False).select(2, 0).select(1).where_equal(0, 'x')
+            self.assertEqual([['x']], list(pipeline))
+        with io.StringIO(self._LINES_TO_READ) as csv_stream:
+            pipeline = csv.pipeline(csv_stream).select('size', 'name').where_equal('name', 'b')
+            self.assertEqual([{'size': '20', 'name': 'b'}], list(pipeline))
+        with io.StringIO(self._LINES_TO_READ) as csv_stream:
+            pipeline = csv.pipeline(csv_stream).select('size').where_equal('name', 'b')
+            self.assertEqual([], list(pipeline))
+
+    def test_fails_on_unknown_column(self):
+        with io.StringIO(self._LINES_TO_READ) as csv_stream:
+            self.assertRaises(ValueError, list, csv.pipeline(csv_stream).where_equal('no_such_column', 'x'))
+
+    def test_fails_on_value_that_is_not_text(self):
+        with io.StringIO(self._LINES_TO_READ) as csv_stream:
+            self.assertRaises(TypeError, csv.pipeline(csv_stream).where_equal, 'size', 1)
+            self.assertRaises(TypeError, csv.pipeline(csv_stream).where_prefix, 'size', 1)
+
+
+class ColumnsTest(unittest.TestCase):
+    _LINES_TO_READ = 'name,size,price\nä,1,2.5\n\nb,2\nc,3,4\n'
+
+    @unittest.skipIf(numpy is None, 'numpy must be installed')
+    def test_can_read_columns(self):
+        with io.StringIO(self._LINES_TO_READ) as csv_stream:
+            name_to_array = csv.read_columns(csv_stream, ['price', 'name', 1], dtypes={'price': float, 'size': 'int32'})
+        self.assertEqual(['name', 'price', 'size'], sorted(name_to_array))
+        self.assertEqual(['ä', 'b', 'c'], list(name_to_array['name']))
+        self.assertEqual(numpy.dtype('int32'), name_to_array['size'].dtype)
+        self.assertEqual([1, 2, 3], list(name_to_array['size']))
+        self.assertEqual(2.5, name_to_array['price'][0])
+        self.assertTrue(numpy.isnan(name_to_array['price'][1]))
+
+    @unittest.skipIf(numpy is None, 'numpy must be installed')
+    def test_can_read_column_batches_without_header(self):
+        with io.StringIO(self._LINES_TO_READ) as csv_stream:
+            batches = list(csv.iter_column_batches(csv_stream, batch_row_count=2, header=False))
+        self.assertEqual([2, 1, 1], [len(batch[0]) for batch in batches])
+        self.assertEqual(['name', 'ä', 'b', 'c'], [value for batch in batches for value in batch[0]])
+        self.assertEqual(['price', '2.5', '', '4'], [value for batch in batches for value in batch[2]])
+
+    @unittest.skipIf(numpy is None, 'numpy must be installed')
+    def test_can_read_columns_from_empty_stream(self):
+        with io.StringIO('') as csv_stream:
+            self.assertEqual({}, csv.read_columns(csv_stream))
+        with io.StringIO('a,b\n') as csv_stream:
+            name_to_array = csv.read_columns(csv_stream, dtypes={'b': float})
+        self.assertEqual(['a', 'b'], sorted(name_to_array))
+        self.assertEqual(0, len(name_to_array['a']))
+        self.assertEqual(numpy.dtype(float), name_to_array['b'].dtype)
+
+    @unittest.skipIf(numpy is not None, 'numpy must not be installed')
+    def test_fails_without_numpy(self):
+        with io.StringIO(self._LINES_TO_READ) as csv_stream:
+            self.assertRaises(ImportError, csv.read_columns, csv_stream)
+
+
+class KeyIndexTest(_CsvTest):
+    def _csv_path(self):
+        rows = [['id', 'name']] + [['%d' % (row_number % 7), 'ä\r\n%d' % row_number] for row_number in range(50)]
+        rows.append(['tab\tand\\n', 'x'])
+        with io.StringIO(newline='') as csv_stream:
+            csv.writer(csv_stream).writerows(rows)
+            content = csv_stream.getvalue().encode('utf-8')
+        return self._temp_path(content)
+
+    def _index_path(self, csv_path):
+        index_path = csv_path + '.id' + csv.KEY_INDEX_SUFFIX
+        self.addCleanup(os.remove, index_path)
+        return index_path
+
+    def test_can_lookup_keys(self):
+        csv_path = self._csv_path()
+        index_path = self._index_path(csv_path)
+        for _ in range(2):
+            with csv.KeyIndex(csv_path, 'id') as key_index:
+                self.assertEqual(index_path, key_index.index_path)
+                for key in range(7):
+                    rows = key_index.lookup('%d' % key)
+                    self.assertEqual(
+                        ['ä\r\n%d' % row_number for row_number in range(key, 50, 7)], [row['name'] for row in rows])
+                self.assertEqual([{'id': 'tab\tand\\n', 'name': 'x'}], key_index.lookup('tab\tand\\n'))
+                self.assertEqual([], key_index.lookup('tab'))
+                self.assertEqual([], key_index.lookup('7'))
+                self.assertEqual([], key_index.lookup(''))
+
+    def test_can_build_index_in_runs(self):
+        csv_path = self._csv_path()
+        index_path = self._index_path(csv_path)
+        with csv.KeyIndex(csv_path, 'id'):
+            pass
+        with io.open(index_path, 'rb') as index_file:
+            expected_index_lines = index_file.readlines()[2:]
+        os.remove(index_path)
+        original_run_size = csv342_extras._KEY_INDEX_RUN_SIZE
+        csv342_extras._KEY_INDEX_RUN_SIZE = 4
+        try:
+            with csv.KeyIndex(csv_path, 'id') as key_index:
+                self.assertEqual(7, len(key_index.lookup('1')))
+        finally:
+            csv342_extras._KEY_INDEX_RUN_SIZE = original_run_size
+        with io.open(index_path, 'rb') as index_file:
+            self.assertEqual(expected_index_lines, index_file.readlines()[2:])
+
+    def test_can_lookup_many_keys(self):
+        csv_path = self._csv_path()
+        self._index_path(csv_path)
+        with csv.KeyIndex(csv_path, 'id') as key_index:
+            key_to_rows = key_index.lookup_many(['1', '8'])
+        self.assertEqual(['1', '8'], sorted(key_to_rows))
+        self.assertEqual(7, len(key_to_rows['1']))
+        self.assertEqual([], key_to_rows['8'])
+
+    def test_can_rebuild_outdated_index(self):
+        csv_path = self._temp_path(b'id,name\r\n1,a\r\n')
+        self._index_path(csv_path)
+        with csv.KeyIndex(csv_path, 'id') as key_index:
+            self.assertEqual([], key_index.lookup('2'))
+        with io.open(csv_path, 'ab') as csv_file:
+            csv_file.write(b'2,b\r\n')
+        with csv.KeyIndex(csv_path, 'id') as key_index:
+            self.assertEqual([{'id': '2', 'name': 'b'}], key_index.lookup('2'))
+
+    def test_fails_on_unknown_key(self):
+        csv_path = self._temp_path(b'id,name\r\n1,a\r\n')
+        self.assertRaises(ValueError, csv.KeyIndex, csv_path, 'no_such_key')
+
+
 class DictWriterTest(_CsvTest):
     def test_can_write(self):
         with io.StringIO() as csv_stream:
@@ -183,6 +1201,76 @@ class DictWriterTest(_CsvTest):
             'name,size,nothing,date_of_birth\nAlice,167.5,,1983-11-27\n',
             content)
 
+    def test_can_convert_columns(self):
+        with io.StringIO(newline='') as csv_stream:
+            csv_writer = csv.DictWriter(
+                csv_stream, ['name', 'is_active', 'date_of_birth'],
+                dtypes={'is_active': 'bool', 'date_of_birth': 'date'}, converters={'name': lambda name: name.upper()})
+            csv_writer.writeheader()
+            csv_writer.writerows([
+                {'name': 'Alice', 'is_active': True, 'date_of_birth': datetime.date(1983, 11, 27)},
+                {'name': 'Bob', 'is_active': False, 'date_of_birth': None},
+            ])
+            self.assertEqual(
+                'name,is_active,date_of_birth\r\nALICE,true,1983-11-27\r\nBOB,false,\r\n',
+                csv_stream.getvalue())
+
+    def test_can_write_missing_and_extra_fields(self):
+        with io.StringIO(newline='') as csv_stream:
+            csv_writer = csv.DictWriter(csv_stream, ['a', 'b'], restval='-', extrasaction='ignore')
+            csv_writer.writerows([{'a': 1}, {'b': 2, 'c': 3}, {'a': 4, 'b': 5}])
+            self.assertEqual('1,-\r\n-,2\r\n4,5\r\n', csv_stream.getvalue())
+
+    def test_can_write_dicts_with_missing_method(self):
+        row_dict = collections.defaultdict(lambda: 'default', a=1)
+        with io.StringIO(newline='') as csv_stream:
+            csv_writer = csv.DictWriter(csv_stream, ['a', 'b'], restval='-')
+            csv_writer.writerow(row_dict)
+            csv_writer.writerow(collections.Counter(b=2))
+            self.assertEqual('1,-\r\n-,2\r\n', csv_stream.getvalue())
+        self.assertEqual({'a': 1}, row_dict)
+
+    def test_fails_on_extra_fields(self):
+        with io.StringIO(newline='') as csv_stream:
+            csv_writer = csv.DictWriter(csv_stream, ['a'])
+            self.assertRaises(ValueError, csv_writer.writerow, {'a': 1, 'b': 2})
+            self.assertRaises(ValueError, csv_writer.writerow, (1, 2))
+
+    def test_can_write_sequences(self):
+        with io.StringIO(newline='') as csv_stream:
+            csv_writer = csv.DictWriter(
+                csv_stream, ['a', 'b', 'c'], restval='-', extrasaction='ignore', dtypes={'c': 'int'})
+            csv_writer.writerows([(1, 2, 3), ['x'], (4, 5, 6, 7)])
+            self.assertEqual('1,2,3\r\nx,-,-\r\n4,5,6\r\n', csv_stream.getvalue())
+
+    def test_can_write_namedtuples(self):
+        Point = collections.namedtuple('Point', 'x y')
+        with io.StringIO(newline='') as csv_stream:
+            csv_writer = csv.DictWriter(csv_stream, ['x', 'y', 'z'], restval='-')
+            csv_writer.writerows([Point(1, 2), Point(x=3, y=4)])
+            self.assertEqual('1,2,-\r\n3,4,-\r\n', csv_stream.getvalue())
+
+    def test_can_write_header_and_return_result_of_writer(self):
+        with io.StringIO(newline='') as csv_stream:
+            csv_writer = csv.DictWriter(csv_stream, ['a', 'b'])
+            self.assertEqual(csv_writer.writerow({'a': 'x', 'b': 'y'}), csv_writer.writeheader())
+            self.assertEqual('x,y\r\na,b\r\n', csv_stream.getvalue())
+
+    def test_can_use_any_iterable_as_fieldnames(self):
+        for fieldnames in ({'a': 1}.keys(), iter(['a'])):
+            with io.StringIO(newline='') as csv_stream:
+                csv_writer = csv.DictWriter(csv_stream, fieldnames)
+                csv_writer.writeheader()
+                csv_writer.writerow({'a': 1})
+                self.assertEqual('a\r\n1\r\n', csv_stream.getvalue())
+
+    def test_can_change_fieldnames(self):
+        with io.StringIO(newline='') as csv_stream:
+            csv_writer = csv.DictWriter(csv_stream, ['a'])
+            csv_writer.fieldnames = ['b', 'a']
+            csv_writer.writerow({'a': 1, 'b': 2})
+            self.assertEqual('2,1\r\n', csv_stream.getvalue())
+
 
 if __name__ == "__main__": # pragma: no cover
     unittest.main()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for csv342_aio.
+"""
+# Copyright (c) 2016-2018, Thomas Aglassinger
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of csv342 nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import asyncio
+import unittest
+
+import csv342_aio
+
+
+def _run(coroutine):
+    if hasattr(asyncio, 'run'):
+        return asyncio.run(coroutine)
+    # Python 3.6
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def _stream_reader(data):
+    result = asyncio.StreamReader()
+    result.feed_data(data)
+    result.feed_eof()
+    return result
+
+
+class _StreamWriter:
+    def __init__(self):
+        self.data = b''
+        self.drain_count = 0
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        self.drain_count += 1
+
+
+async def _rows(csv_reader):
+    return [row async for row in csv_reader]
+
+
+class AsyncReaderTest(unittest.TestCase):
+    def test_can_read_rows(self):
+        async def read_rows(chunk_size):
+            csv_stream = _stream_reader('ä,"b\r\n""c"""\r\n\r\nd\re'.encode('utf-8'))
+            return await _rows(csv342_aio.reader(csv_stream, chunk_size=chunk_size))
+
+        expected_rows = [['ä', 'b\r\n"c"'], [], ['d'], ['e']]
+        for chunk_size in (1, 2, 3, 1000):
+            self.assertEqual(expected_rows, _run(read_rows(chunk_size)), 'chunk_size=%d' % chunk_size)
+
+    def test_can_read_lines_of_text(self):
+        class _LineSource:
+            def __init__(self, lines):
+                self._lines = list(lines)
+
+            async def readline(self):
+                return self._lines.pop(0) if self._lines else ''
+
+        csv_reader = csv342_aio.reader(_LineSource(['a,"b\n', 'c"\n', 'd\n']))
+        self.assertEqual([['a', 'b\nc'], ['d']], _run(_rows(csv_reader)))
+
+    def test_can_read_rows_in_batches(self):
+        async def read_batches():
+            csv_reader = csv342_aio.reader(_stream_reader(b'a\nb\nc\n'))
+            return [await csv_reader.read_rows(2), await csv_reader.read_rows(2), await csv_reader.read_rows(2)]
+
+        self.assertEqual([[['a'], ['b']], [['c']], []], _run(read_batches()))
+
+    def test_fails_on_escapechar(self):
+        class _EmptySource:
+            async def read(self, size):
+                return b''
+
+        self.assertRaises(ValueError, csv342_aio.reader, _EmptySource(), escapechar='\\')
+
+
+class AsyncDictReaderTest(unittest.TestCase):
+    def test_can_read_dicts(self):
+        async def read_dicts_and_fieldnames():
+            csv_reader = csv342_aio.DictReader(_stream_reader(b'a,b\n1,2\n\n3\n'))
+            return await _rows(csv_reader), csv_reader.fieldnames
+
+        dicts, fieldnames = _run(read_dicts_and_fieldnames())
+        self.assertEqual([{'a': '1', 'b': '2'}, {'a': '3', 'b': None}], dicts)
+        self.assertEqual(['a', 'b'], fieldnames)
+
+
+class AsyncWriterTest(unittest.TestCase):
+    def test_can_write_rows(self):
+        async def write_rows():
+            csv_writer = csv342_aio.writer(target_stream)
+            await csv_writer.writerow(['ä', None])
+            await csv_writer.writerows([['b', 1], ['"c"']], batch_row_count=1)
+
+        target_stream = _StreamWriter()
+        _run(write_rows())
+        self.assertEqual('ä,\r\nb,1\r\n"""c"""\r\n'.encode('utf-8'), target_stream.data)
+        self.assertEqual(3, target_stream.drain_count)
+
+    def test_can_write_dicts_from_async_iterable(self):
+        async def dicts():
+            for number in range(3):
+                yield {'a': number}
+
+        async def write_dicts():
+            csv_writer = csv342_aio.DictWriter(target_stream, ['a', 'b'])
+            self.assertEqual(5, await csv_writer.writeheader())
+            await csv_writer.writerows(dicts())
+
+        target_stream = _StreamWriter()
+        _run(write_dicts())
+        self.assertEqual(b'a,b\r\n0,\r\n1,\r\n2,\r\n', target_stream.data)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()